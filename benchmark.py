@@ -0,0 +1,438 @@
+#
+# benchmark.py
+#
+# Rough timings for jss_tools against made up records so we don't
+# need a JSS to see if something got faster or slower.
+#
+
+import fake_fleet
+import jss_apps
+import jss_fleet
+import jss_graph
+import jss_groups
+import jss_snapshot
+import jss_tools as tools
+import os_compliance
+import os
+import json
+import multiprocessing
+import platform
+import random
+import sys
+import tempfile
+import time
+import timeit
+from distutils.version import StrictVersion
+from dateutil import parser
+from xml.etree import ElementTree
+
+
+def build_record(root, keys):
+    """Build a record with an element for every path in a key table."""
+    record = ElementTree.Element(root)
+    for key in keys:
+        node = record
+        for tag in key[0].split('/'):
+            child = node.find(tag)
+            if child is None:
+                child = ElementTree.SubElement(node, tag)
+            node = child
+        node.text = 'x'
+    return record
+
+
+# something sensible for each Convert type so the extractors run
+_samples = {
+    'BOOL': 'true',
+    'INTN': '42',
+    'DATE': '2017-12-06',
+    'TIME': '2018-07-02 16:06:50',
+    'DUTC': '2018-07-02T16:06:50.653+1000',
+    'EPOK': '1530511610653',
+}
+
+
+def build_info_record(root, keys, convert_keys):
+    """Build a record with an element for every path in a key table holding
+    a value its convert table can read.
+    """
+    record = build_record(root, keys)
+    types = dict(convert_keys)
+    for key in keys:
+        if key[1] in types:
+            record.find(key[0]).text = _samples[types[key[1]]]
+    return record
+
+
+def findtext_loop(record, keys):
+    """What the extractors did before they had a compiled plan."""
+    dict = {}
+    for key in keys:
+        dict.update({key[1]: record.findtext(key[0])})
+    return dict
+
+
+def bench_plans(number=5000):
+    print "Key table lookups, %d records each" % number
+    tables = [
+        ['c_info', 'computer', tools._c_info_keys, tools._c_info_plan],
+        ['m_info', 'mobile_device', tools._m_info_keys, tools._m_info_plan],
+        ['m_security', 'mobile_device', tools._m_security_keys,
+         tools._m_security_plan],
+        ['m_network', 'mobile_device', tools._m_network_keys,
+         tools._m_network_plan],
+    ]
+    for name, root, keys, plan in tables:
+        record = build_record(root, keys)
+        assert findtext_loop(record, keys) == tools._extract(record, plan)
+        old = timeit.timeit(lambda: findtext_loop(record, keys),
+                            number=number)
+        new = timeit.timeit(lambda: tools._extract(record, plan),
+                            number=number)
+        print "%-14s %3d keys  findtext %.3fs  plan %.3fs  %.1fx" % (
+            name, len(keys), old, new, old / new)
+
+
+def bench_convert(number=20000):
+    print "Date conversion, %d values each" % number
+    for typ, val in [['DATE', '2017-12-06'],
+                     ['TIME', '2018-07-02 16:06:50'],
+                     ['DUTC', '2018-07-02T16:06:50.653+1000']]:
+        assert tools.Convert(val, typ) == parser.parse(val)
+        old = timeit.timeit(lambda: parser.parse(val), number=number)
+        new = timeit.timeit(lambda: tools.Convert(val, typ), number=number)
+        print "%-14s dateutil %.3fs  Convert %.3fs  %.1fx" % (
+            typ, old, new, old / new)
+
+
+def check_one(info):
+    """What compliance.py did for each Mac before os_compliance."""
+    if StrictVersion(info['os']) < StrictVersion('10.12.6'):
+        return 'os_upgrade'
+    if 'G' in info['os_build']:
+        return None
+    if StrictVersion(info['os']) > StrictVersion('10.13.0') and (
+            int(info['os_build'], 16) < 97416):
+        return 'os_update'
+    if (StrictVersion(info['os']) > StrictVersion('10.12.0')) and (
+            int(info['os_build'], 16) < 94067):
+        return 'os_update'
+    return None
+
+
+def bench_compliance(number=100000):
+    print "OS compliance, %d made up Macs" % number
+    pairs = [['10.11.6', '15G22010'], ['10.12.5', '16F73'],
+             ['10.12.6', '16G29'], ['10.12.6', '16G1510'],
+             ['10.13.3', '17D47'], ['10.13.3', '17D102'],
+             ['10.13.4', '17E199'], ['10.13.6', '17G65']]
+    # builds check_one passed that are older than the rule for 10.13
+    stricter = [['10.13.0', '17A365'], ['10.13.1', '17B1003']]
+    for os, build in stricter:
+        info = {'os': os, 'os_build': build}
+        assert check_one(info) is None
+        assert os_compliance.check([info]) == ['os_update']
+    infos = []
+    for _ in range(number):
+        os, build = random.choice(pairs)
+        infos.append({'os': os, 'os_build': build})
+    assert [check_one(info) for info in infos] == os_compliance.check(infos)
+    old = timeit.timeit(lambda: [check_one(info) for info in infos], number=1)
+    new = timeit.timeit(lambda: os_compliance.check(infos), number=1)
+    print "%-14s check_one %.3fs  check %.3fs  %.1fx" % (
+        'compliance', old, new, old / new)
+
+
+def bench_records(number=20000):
+    print "Memory for %d records, not counting the values they share" % number
+    for name, cls in [['c_info', tools.CInfo], ['m_info', tools.MInfo]]:
+        infos = []
+        for ii in range(number):
+            infos.append(dict((key, '%s%d' % (key, ii))
+                              for key in cls.__slots__))
+        records = [cls.from_dict(info) for info in infos]
+        assert records[-1].to_dict() == infos[-1]
+        old = sum(sys.getsizeof(info) for info in infos)
+        new = sum(sys.getsizeof(record) for record in records)
+        print "%-14s %3d keys  dict %.1fMB  slots %.1fMB  %.1fx" % (
+            name, len(cls.__slots__), old / 1e6, new / 1e6,
+            float(old) / new)
+
+
+def bench_lazy(number=5000):
+    print "Reading 3 keys, %d records each" % number
+    tables = [
+        ['c_info', 'computer', tools.c_info, tools._c_info_keys,
+         tools._c_info_convert_keys, ['serial', 'os', 'last']],
+        ['m_info', 'mobile_device', tools.m_info, tools._m_info_keys,
+         tools._m_info_convert_keys, ['serial_number', 'os_version',
+                                      'last_inventory']],
+    ]
+    for name, root, func, keys, convert_keys, wanted in tables:
+        record = build_info_record(root, keys, convert_keys)
+        assert func(record, lazy=True).to_dict() == func(record)
+
+        def read(lazy):
+            info = func(record, lazy=lazy)
+            return [info[key] for key in wanted]
+
+        old = timeit.timeit(lambda: read(False), number=number)
+        new = timeit.timeit(lambda: read(True), number=number)
+        print "%-14s eager %.3fs  lazy %.3fs  %.1fx" % (
+            name, old, new, old / new)
+
+
+def bench_apps(number=20000):
+    print "App index, %d made up Macs with 60 apps each" % number
+    apps = ['App %d' % ii for ii in range(200)]
+    versions = ['%d.%d.%d' % (major, minor, 0)
+                for major in range(60, 70) for minor in range(3)]
+    fleet = {}
+    for id in range(number):
+        fleet[id] = dict((app, random.choice(versions))
+                         for app in random.sample(apps, 60))
+    index = jss_apps.AppIndex()
+    taken = timeit.timeit(
+        lambda: [index.add(id, fleet[id]) for id in fleet], number=1)
+    print "%-14s %.3fs" % ('add', taken)
+    walk = lambda: [str(id) for id in fleet if 'App 1' in fleet[id] and
+                    jss_apps.version_key(fleet[id]['App 1']) < (65, 1)]
+    assert set(walk()) == index.outdated('App 1', '65.1')
+    for name, func in [
+            ['walk records', walk],
+            ['count', lambda: index.count('App 1')],
+            ['outdated_count', lambda: index.outdated_count('App 1', '65.1')],
+            ['outdated', lambda: index.outdated('App 1', '65.1')]]:
+        taken = timeit.timeit(func, number=10) / 10
+        print "%-14s %.3fms" % (name, taken * 1000)
+
+
+def bench_groups(number=20000):
+    print "Group index, %d made up Macs in 50 groups" % number
+    groups = []
+    for gid in range(50):
+        members = random.sample(range(number), number // (gid % 5 + 2))
+        groups.append({'id': str(gid), 'name': 'Group %d' % gid,
+                       'computers': [{'id': str(id)} for id in members]})
+    index = jss_groups.GroupIndex()
+    taken = timeit.timeit(
+        lambda: [index.add(group) for group in groups], number=1)
+    print "%-14s %.3fs" % ('add', taken)
+    sets = dict((group['id'], set(computer['id']
+                                  for computer in group['computers']))
+                for group in groups)
+    walk = lambda: sets['0'] - sets['1'] - sets['2']
+    assert walk() == index.difference(0, 1, 2)
+    # the ids themselves cost more than the bit operation so time both
+    for name, func in [
+            ['set difference', walk],
+            ['difference', lambda: index.difference(0, 1, 2)],
+            ['  as a set', lambda: set(index.difference(0, 1, 2))],
+            ['intersection', lambda: index.intersection(0, 1, 2)],
+            ['  as a set', lambda: set(index.intersection(0, 1, 2))],
+            ['union', lambda: index.union(0, 1, 2)],
+            ['  as a set', lambda: set(index.union(0, 1, 2))]]:
+        taken = timeit.timeit(func, number=10) / 10
+        print "%-14s %.3fms" % (name, taken * 1000)
+
+
+def bench_graph(number=2000):
+    print "Policy graph, %d made up policies with 3 packages each" % number
+    policies = []
+    for id in range(number):
+        policies.append({'id': str(id), 'cat_name': 'Category %d' % (id % 20),
+                         'paks': [{'id': str(pak)}
+                                  for pak in random.sample(range(500), 3)],
+                         'scripts': [None]})
+    graph = jss_graph.PolicyGraph()
+    taken = timeit.timeit(
+        lambda: [graph.add_policy(pol) for pol in policies], number=1)
+    print "%-14s %.3fs" % ('add', taken)
+    scan = lambda: set(pol['id'] for pol in policies
+                       if any(pak['id'] == '7' for pak in pol['paks']))
+    assert scan() == graph.policies_with_package(7)
+    for name, func in [
+            ['scan policies', scan],
+            ['lookup', lambda: graph.policies_with_package(7)],
+            ['update one', lambda: graph.add_policy(policies[0])]]:
+        taken = timeit.timeit(func, number=10) / 10
+        print "%-14s %.3fms" % (name, taken * 1000)
+
+
+def bench_parallel(number=2000):
+    print "Extracting %d cached records, %d CPUs" % (
+        number, multiprocessing.cpu_count())
+    raws = [fake_fleet.computer(id, apps=300, attributes=50)
+            for id in range(1, number + 1)]
+    extractors = [tools.c_info, tools.c_apps, tools.c_attributes]
+    serial = lambda: [jss_fleet._results(ElementTree.fromstring(raw),
+                                         extractors) for raw in raws]
+    parallel = lambda: list(jss_fleet.extract_records(raws, extractors,
+                                                      ordered=True))
+    assert serial()[:10] == parallel()[:10]
+    old = timeit.timeit(serial, number=1)
+    new = timeit.timeit(parallel, number=1)
+    print "%-14s serial %.3fs  processes %.3fs  %.1fx" % (
+        'extract', old, new, old / new)
+
+
+def bench_snapshot(number=20000):
+    print "Snapshot of %d made up Macs" % number
+    record = build_info_record('computer', tools._c_info_keys,
+                               tools._c_info_convert_keys)
+    outputs = {
+        'c_info': tools.c_info(record),
+        'c_apps': dict(('App %d' % ii, '%d.0' % ii) for ii in range(40)),
+        'c_attributes': dict(('EA %d' % ii, {'value': True, 'type': 'EBOL'})
+                             for ii in range(5)),
+        'c_groups': ['Group %d' % ii for ii in range(5)],
+    }
+    path = os.path.join(tempfile.mkdtemp(), 'snapshot.db')
+    snap = jss_snapshot.Snapshot(path)
+    taken = timeit.timeit(lambda: snap.put_many(
+        [id, outputs, None] for id in range(number)), number=1)
+    print "%-14s %.3fs  %.1fMB" % ('save', taken,
+                                   os.path.getsize(path) / 1e6)
+    assert snap.get(number // 2) == outputs
+    print "%-14s %.3fs" % ('load', timeit.timeit(snap.load, number=1))
+    taken = timeit.timeit(lambda: snap.get(number // 2), number=100) / 100
+    print "%-14s %.3fms" % ('get one', taken * 1000)
+    snap.close()
+    os.remove(path)
+
+
+class _JSS(object):
+    """Takes the PUTs from the write routines and throws them away."""
+
+    def put(self, url, data):
+        ElementTree.tostring(data)
+
+
+class OfflineRecord(ElementTree.Element):
+    """A record that can be saved without a JSS, what python-jss gives us
+    with save() and put() going nowhere, so the write routines can be timed.
+    """
+
+    jss = _JSS()
+    url = 'offline/id/1'
+
+    def save(self):
+        ElementTree.tostring(self)
+
+
+def offline(xml):
+    """Parses raw XML into an OfflineRecord."""
+    xml_parser = ElementTree.XMLParser(
+        target=ElementTree.TreeBuilder(element_factory=OfflineRecord))
+    xml_parser.feed(xml)
+    return xml_parser.close()
+
+
+def _writes(info, info_write, attributes, attributes_write):
+    """The write routines for one kind of record, each changing a field so
+    there is something to send.
+    """
+    def info_change(record, minimal):
+        changed = info(record)
+        changed['building'] = changed['building'] + 'x'
+        info_write(changed, record, minimal=minimal)
+
+    def attribute_change(record, minimal):
+        changed = attributes(record)
+        changed['EA 5']['value'] = changed['EA 5']['value'] + 'x'
+        attributes_write(changed, record, minimal=minimal)
+
+    name = info_write.__name__
+    attr_name = attributes_write.__name__
+    return [
+        [name, lambda record: info_change(record, False)],
+        [name + ' minimal', lambda record: info_change(record, True)],
+        [attr_name, lambda record: attribute_change(record, False)],
+        [attr_name + ' minimal', lambda record: attribute_change(record, True)],
+    ]
+
+
+def bench_extractors(path=None, records=20, apps=3000, attributes=200,
+                     number=3):
+    """Times every extractor and write routine against records made up by
+    fake_fleet, each with apps apps and attributes extension attributes.
+    Writes what it found to path as JSON if you give it one so you can keep
+    them and compare.
+    """
+    print "Extractors, %d made up records with %d apps and %d EAs" % (
+        records, apps, attributes)
+    computers = [fake_fleet.computer(id, apps, attributes)
+                 for id in range(1, records + 1)]
+    devices = [fake_fleet.mobile_device(id, attributes)
+               for id in range(1, records + 1)]
+    policies = [fake_fleet.policy(id) for id in range(1, records + 1)]
+    groups = [fake_fleet.computergroup(id, range(1, 1001))
+              for id in range(1, records + 1)]
+    packages = [fake_fleet.package(id) for id in range(1, records + 1)]
+    scripts = [fake_fleet.script(id) for id in range(1, records + 1)]
+    categories = [fake_fleet.category(id) for id in range(1, records + 1)]
+    tests = [
+        [computers, [tools.c_info, tools.c_apps, tools.c_attributes,
+                     tools.c_users, tools.c_certificates, tools.c_profiles,
+                     tools.c_groups]],
+        [devices, [tools.m_info, tools.m_attributes, tools.m_security,
+                   tools.m_network]],
+        [policies, [tools.policy]],
+        [groups, [tools.computergroup]],
+        [packages, [tools.package]],
+        [scripts, [tools.script]],
+        [categories, [tools.category]],
+    ]
+    results = {}
+
+    def run(name, xmls, func):
+        parsed = [offline(xml) for xml in xmls]
+        taken = min(timeit.repeat(
+            lambda: [func(record) for record in parsed],
+            number=1, repeat=number)) / len(parsed)
+        results[name] = taken
+        print "%-28s %.3fms" % (name, taken * 1000)
+
+    taken = min(timeit.repeat(lambda: [offline(xml) for xml in computers],
+                              number=1, repeat=number)) / records
+    results['parse computer'] = taken
+    print "%-28s %.3fms" % ('parse computer', taken * 1000)
+    for xmls, funcs in tests:
+        for func in funcs:
+            run(func.__name__, xmls, func)
+    for xmls, writes in [
+            [computers, _writes(tools.c_info, tools.c_info_write,
+                                tools.c_attributes, tools.c_attributes_write)],
+            [devices, _writes(tools.m_info, tools.m_info_write,
+                              tools.m_attributes, tools.m_attributes_write)]]:
+        for name, func in writes:
+            run(name, xmls, func)
+    if path:
+        with open(path, 'w') as ff:
+            json.dump({
+                'time': time.time(),
+                'python': platform.python_version(),
+                'records': records,
+                'apps': apps,
+                'attributes': attributes,
+                'seconds_per_record': results,
+            }, ff, indent=2, sort_keys=True)
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        # just the extractors, results to the file named
+        bench_extractors(sys.argv[1])
+        sys.exit()
+    bench_plans()
+    bench_convert()
+    bench_compliance()
+    bench_records()
+    bench_lazy()
+    bench_apps()
+    bench_groups()
+    bench_graph()
+    bench_snapshot()
+    bench_parallel()
+    bench_extractors()
@@ -3,8 +3,9 @@
 #
 
 from jss_tools import *
+from jss_fleet import iter_computers
+from os_compliance import report
 import sys
-from distutils.version import StrictVersion
 
 
 def printf(format, *args):
@@ -17,30 +18,9 @@ def non_compliance(info, reason):
            info['email'], reason, str(info['os']), str(info['os_build']))
 
 
-def check_one(info):
-    OS13BUILD = 97416
-    OS12BUILD = 94067
-    if StrictVersion(info['os']) < StrictVersion('10.12.6'):
-        non_compliance(info, 'os_upgrade')
-        return
-    # 10.12.6 has two builds with 'G' :( Apple. Luckily both are compliant.
-    if 'G' in info['os_build']:
-        return
-    if StrictVersion(info['os']) > StrictVersion('10.13.0') and (
-            int(info['os_build'], 16) < OS13BUILD):
-        non_compliance(info, 'os_update')
-        return
-    if (StrictVersion(info['os']) > StrictVersion('10.12.0')) and (
-            int(info['os_build'], 16) < OS12BUILD):
-        non_compliance(info, 'os_update')
-        return
-
-
 j = Jopen()
 
-for computer in j.Computer():
-    check_one(c_info(computer.retrieve()))
-    # unfolded version for demo purposes
-#     one_computer = computer.retrieve()
-#     info = c_info(one_computer)
-#     check_one(info)
+# each Mac is checked as it arrives, nothing waits for the whole fleet
+infos = (result['c_info'] for result in iter_computers(j, workers=16))
+for info, reason in report(infos):
+    non_compliance(info, reason)
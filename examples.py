@@ -74,6 +74,23 @@ for mac in c_group['computers']:
     printf("User: %s Email: %s OS: %s Build: %s\n", ii['name'],
            ii['email'], ii['os'], ii['os_build'])
 
+# the same, fetching the members 8 at a time
+from jss_fleet import expand_groups
+
+for result in expand_groups(jss, c_group):
+    ii = result['c_info']
+    printf("User: %s Email: %s OS: %s Build: %s\n", ii['name'],
+           ii['email'], ii['os'], ii['os_build'])
+
+# Macs in one group but not another without fetching them
+from jss_groups import GroupIndex
+
+index = GroupIndex()
+for group in [79, 80]:
+    index.add(tools.computergroup(jss.ComputerGroup(group)))
+for id in index.difference(79, 80):
+    printf("ID: %s\n", id)
+
 # check an attribute
 for computer in jss.Computer():
     mac = computer.retrieve()
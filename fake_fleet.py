@@ -0,0 +1,548 @@
+#
+# fake_fleet.py
+#
+# made up JSS records, as many as you like, so we can time things
+# without a JSS.
+#
+"""Made up JSS records at whatever scale you need.
+
+Each routine returns the raw XML the JSS would give for one record, built
+from the key tables in jss_tools so every extractor finds everything it
+reads, with values that look like the real thing: OS versions and builds
+that go together, dates in the JSS formats, extension attributes of every
+type including the fake booleans.
+
+    xml = computer(64, apps=3000, attributes=200)
+    record = ElementTree.fromstring(xml)
+    print c_info(record)['serial']
+
+write_fleet() lays a whole fleet out as <dir>/<kind>/<id>.xml for
+mock_jss, or from the command line
+
+    python fake_fleet.py fleet 50000 3000 200
+
+for 50,000 Macs with 3,000 apps and 200 extension attributes each. The
+same seed always gives the same fleet.
+"""
+
+import os
+import random
+import string
+import sys
+from xml.etree import ElementTree
+
+import jss_tools as tools
+
+# releases and the builds that go with them
+_os_builds = [
+    ['10.11.6', ['15G1611', '15G20015', '15G22010']],
+    ['10.12.6', ['16G29', '16G1036', '16G1212', '16G1510']],
+    ['10.13.3', ['17D47', '17D102']],
+    ['10.13.4', ['17E199', '17E202']],
+    ['10.13.6', ['17G65', '17G2208']],
+]
+
+_ios_builds = [
+    ['11.3', '15E216'],
+    ['11.4', '15F79'],
+    ['11.4.1', '15G77'],
+    ['12.0', '16A366'],
+]
+
+_models = [
+    ['MacBook Pro (13-inch, 2017)', 'MacBookPro14,1'],
+    ['MacBook Pro (15-inch, 2018)', 'MacBookPro15,1'],
+    ['MacBook Air (13-inch, 2017)', 'MacBookAir7,2'],
+    ['iMac (Retina 5K, 27-inch, 2017)', 'iMac18,3'],
+    ['Mac mini (Late 2014)', 'Macmini7,1'],
+]
+
+_devices = [
+    ['iPad (6th Generation)', 'iPad7,5'],
+    ['iPad Pro (10.5-inch)', 'iPad7,3'],
+    ['iPhone 8', 'iPhone10,4'],
+    ['iPhone X', 'iPhone10,6'],
+]
+
+_firsts = ['Alex', 'Sam', 'Jo', 'Chris', 'Pat', 'Lee', 'Robin', 'Kim',
+           'Morgan', 'Jamie', 'Drew', 'Casey']
+_surnames = ['Smith', 'Nguyen', 'Jones', 'Brown', 'Wilson', 'Taylor',
+             'Chen', 'Singh', 'Walker', 'Harris', 'Martin', 'Lee']
+_buildings = ['HQ', 'North', 'South', 'Warehouse', 'Lab']
+
+# apps everyone has, then the long tail, 'App 123'
+_apps = ['Google Chrome', 'Firefox', 'Safari', 'Self Service',
+         'Microsoft Word', 'Microsoft Excel', 'Microsoft Outlook', 'Slack',
+         'Zoom', 'Chess', 'Calculator', 'Terminal']
+
+
+class _Fake(object):
+    """Values that look like what the JSS gives, from one random.Random so
+    the same seed always makes the same records.
+    """
+
+    def __init__(self, rand):
+        self.rand = rand
+
+    def choice(self, seq):
+        return self.rand.choice(seq)
+
+    def digits(self, count):
+        return ''.join(self.rand.choice(string.digits) for _ in range(count))
+
+    def serial(self):
+        return ''.join(self.rand.choice(string.ascii_uppercase + string.digits)
+                       for _ in range(12))
+
+    def mac(self):
+        return ':'.join('%02X' % self.rand.randrange(256) for _ in range(6))
+
+    def ip(self):
+        return '10.%d.%d.%d' % (self.rand.randrange(256),
+                                self.rand.randrange(256),
+                                self.rand.randrange(1, 255))
+
+    def epoch(self):
+        # some time in 2018, in milliseconds
+        return 1514764800000 + self.rand.randrange(31536000) * 1000
+
+    def date(self):
+        return '2018-%02d-%02d' % (self.rand.randrange(1, 13),
+                                   self.rand.randrange(1, 29))
+
+    def time(self):
+        return '%s %02d:%02d:%02d' % (self.date(), self.rand.randrange(24),
+                                      self.rand.randrange(60),
+                                      self.rand.randrange(60))
+
+    def dutc(self):
+        return '%sT%02d:%02d:%02d.%03d+1000' % (
+            self.date(), self.rand.randrange(24), self.rand.randrange(60),
+            self.rand.randrange(60), self.rand.randrange(1000))
+
+    def typed(self, typ):
+        """A value Convert can read as typ."""
+        if typ == 'BOOL':
+            return self.choice(['true', 'false'])
+        if typ == 'INTN':
+            return str(self.rand.randrange(100000))
+        if typ == 'DATE':
+            return self.date()
+        if typ == 'TIME':
+            return self.time()
+        if typ == 'DUTC':
+            return self.dutc()
+        if typ == 'EPOK':
+            return str(self.epoch())
+        return 'x'
+
+    def person(self):
+        first = self.choice(_firsts)
+        surname = self.choice(_surnames)
+        return first, surname
+
+
+def _set(record, path, text):
+    """Sets the text at path in record, making the elements on the way."""
+    node = record
+    for tag in path.split('/'):
+        child = node.find(tag)
+        if child is None:
+            child = ElementTree.SubElement(node, tag)
+        node = child
+    node.text = text
+    return node
+
+
+def _fill(record, fake, keys, convert_keys, values):
+    """Puts a value at every path in a key table, from values if it has the
+    key's name, otherwise one its convert type can read.
+    """
+    types = dict(convert_keys)
+    for key in keys:
+        if isinstance(key, str):
+            key = [key, key]
+        val = values.get(key[1])
+        if val is None:
+            val = fake.typed(types.get(key[1]))
+        _set(record, key[0], val)
+
+
+def _list(parent, tag, items):
+    """Adds <size> and an element for each dictionary in items."""
+    _set(parent, 'size', str(len(items)))
+    for item in items:
+        child = ElementTree.SubElement(parent, tag)
+        for key, val in item:
+            _set(child, key, val)
+
+
+def _attributes(record, fake, count):
+    """Adds count extension attributes, strings, numbers, dates and both
+    kinds of fake boolean.
+    """
+    eas = _set(record, 'extension_attributes', None)
+    for ii in range(count):
+        kind = ii % 5
+        if kind == 0:
+            typ, val = 'String', fake.choice(['True', 'False'])
+        elif kind == 1:
+            typ, val = 'String', fake.choice(['0', '1'])
+        elif kind == 2:
+            typ, val = 'Number', str(fake.rand.randrange(1000))
+        elif kind == 3:
+            typ, val = 'Date', fake.time()
+        else:
+            typ, val = 'String', 'value %d' % fake.rand.randrange(1000)
+        ea = ElementTree.SubElement(eas, 'extension_attribute')
+        for key, text in [['id', str(ii + 1)], ['name', 'EA %d' % (ii + 1)],
+                          ['type', typ], ['value', val]]:
+            ElementTree.SubElement(ea, key).text = text
+
+
+def computer(id, apps=60, attributes=20, users=3, certificates=5,
+             profiles=5, groups=5, seed=None):
+    """Returns the XML of a made up computer record with id and that many
+    apps, extension attributes, local users, certificates, configuration
+    profiles and group memberships.
+    """
+    fake = _Fake(random.Random(id if seed is None else seed))
+    first, surname = fake.person()
+    release, builds = fake.choice(_os_builds)
+    model, model_id = fake.choice(_models)
+    serial = fake.serial()
+    record = ElementTree.Element('computer')
+    _fill(record, fake, tools._c_info_keys, tools._c_info_convert_keys, {
+        'id': str(id),
+        'machine_name': ('MB' if 'Book' in model else 'MD') + serial,
+        'mac': fake.mac(),
+        'mac2': fake.mac(),
+        'ip': fake.ip(),
+        'serial': serial,
+        'barcode1': '',
+        'barcode2': '',
+        'tag': fake.digits(6),
+        'man_username': 'jamf',
+        'man_pass': fake.digits(64),
+        'model': model,
+        'model_id': model_id,
+        'os': release,
+        'os_build': fake.choice(builds),
+        'AD': 'Not Bound',
+        'recovery': 'Not Present',
+        'user': first.lower() + surname[0].lower(),
+        'name': '%s, %s' % (surname.upper(), first),
+        'email': '%s.%s@example.com' % (first, surname.upper()),
+        'building': fake.choice(_buildings),
+        'room': str(fake.rand.randrange(1, 500)),
+        'profiles_count': str(profiles),
+    })
+    _set(record, 'general/udid', serial + '-UDID')
+    _set(record, 'general/report_date_utc', fake.dutc())
+    _set(record, 'general/report_date_epoch', str(fake.epoch()))
+    _set(record, 'location/department', 'Department %d' % (id % 20))
+
+    names = list(_apps) + ['App %d' % ii
+                           for ii in range(max(0, apps - len(_apps)))]
+    _list(_set(record, 'software/applications', None), 'application', [
+        [['name', nm + '.app'], ['path', '/Applications/%s.app' % nm],
+         ['version', '%d.%d.%d' % (fake.rand.randrange(1, 70),
+                                   fake.rand.randrange(10),
+                                   fake.rand.randrange(10))]]
+        for nm in names[:apps]])
+
+    _attributes(record, fake, attributes)
+
+    accounts = _set(record, 'groups_accounts', None)
+    memberships = _set(accounts, 'computer_group_memberships', None)
+    for ii in range(groups):
+        ElementTree.SubElement(memberships, 'group').text = 'Group %d' % ii
+    local = _set(accounts, 'local_accounts', None)
+    for ii in range(users):
+        user = ElementTree.SubElement(local, 'user')
+        _fill(user, fake, tools._c_user_keys, tools._c_user_convert_keys, {
+            'name': '_mbsetupuser' if ii == 0 else 'user%d' % ii,
+            'realname': 'User %d' % ii,
+            'uid': str(501 + ii),
+            'home': '/Users/user%d' % ii,
+            'home_size_mb': str(fake.rand.randrange(100000)),
+        })
+
+    certs = _set(record, 'certificates', None)
+    for ii in range(certificates):
+        epoch = fake.epoch()
+        cert = ElementTree.SubElement(certs, 'certificate')
+        _fill(cert, fake, tools._c_certificates_keys,
+              tools._c_certificates_convert_keys, {
+                  'common': 'Certificate %d' % ii,
+                  'identity': fake.choice(['true', 'false']),
+                  'epoch': str(epoch),
+                  'name': 'Certificate %d' % ii,
+              })
+
+    profs = _set(record, 'configuration_profiles', None)
+    _set(profs, 'size', str(profiles))
+    for ii in range(profiles):
+        prof = ElementTree.SubElement(profs, 'configuration_profile')
+        _fill(prof, fake, tools._c_profiles_keys,
+              tools._c_profiles_convert_keys, {
+                  'id': str(ii + 1),
+                  'name': 'Profile %d' % (ii + 1),
+                  'uuid': '%s-%d' % (serial, ii),
+              })
+    return ElementTree.tostring(record)
+
+
+def mobile_device(id, attributes=10, seed=None):
+    """Returns the XML of a made up mobile device record with id and that
+    many extension attributes.
+    """
+    fake = _Fake(random.Random(id if seed is None else seed))
+    first, surname = fake.person()
+    release, build = fake.choice(_ios_builds)
+    model, model_id = fake.choice(_devices)
+    serial = fake.serial()
+    record = ElementTree.Element('mobile_device')
+    _fill(record, fake, tools._m_info_keys, tools._m_info_convert_keys, {
+        'id': str(id),
+        'display_name': "%s's %s" % (first, model.split(' ')[0]),
+        'device_name': "%s's %s" % (first, model.split(' ')[0]),
+        'name': "%s's %s" % (first, model.split(' ')[0]),
+        'asset_tag': fake.digits(6),
+        'capacity': '32768',
+        'available': str(fake.rand.randrange(32768)),
+        'percentage_used': str(fake.rand.randrange(100)),
+        'os_type': 'iOS',
+        'os_version': release,
+        'os_build': build,
+        'serial_number': serial,
+        'udid': serial + '-UDID',
+        'initial_entry_epoch': str(fake.epoch()),
+        'initial_entry_utc': fake.dutc(),
+        'phone_number': '',
+        'ip_address': fake.ip(),
+        'wifi_mac_address': fake.mac(),
+        'bluetooth_mac_address': fake.mac(),
+        'modem_firmware': '',
+        'model': model,
+        'model_identifier': model_id,
+        'model_number': 'M' + fake.digits(4),
+        'model_display': model,
+        'device_ownership_level': 'Institutional',
+        'activesync_id': fake.serial(),
+        'last_cloud_backup_utc': fake.dutc(),
+        'site_id': '-1',
+        'site_name': 'None',
+        'username': first.lower() + surname[0].lower(),
+        'realname': '%s %s' % (first, surname),
+        'real_name': '%s %s' % (first, surname),
+        'email_address': '%s.%s@example.com' % (first, surname.upper()),
+        'position': '',
+        'phone': '',
+        'department': 'Department %d' % (id % 20),
+        'building': fake.choice(_buildings),
+        'room': str(fake.rand.randrange(1, 500)),
+    })
+    _fill(record, fake, tools._m_security_keys,
+          tools._m_security_convert_keys, {
+              'lost_mode_enabled': 'false',
+              'lost_mode_message': '',
+              'lost_mode_phone': '',
+              'lost_mode_footnote': '',
+          })
+    _fill(record, fake, tools._m_network_keys, tools._m_network_convert_keys,
+          {
+              'home_carrier_network': 'Carrier',
+              'cellular_technology': 'GSM',
+              'imei': fake.digits(15),
+              'iccid': fake.digits(19),
+              'meid': fake.digits(14),
+              'current_carrier_network': 'Carrier',
+              'carrier_settings_version': '31.0',
+              'current_mobile_country_code': '505',
+              'current_mobile_network_code': '01',
+              'home_mobile_country_code': '505',
+              'home_mobile_network_code': '01',
+              'phone_number': '04' + fake.digits(8),
+          })
+    _attributes(record, fake, attributes)
+    return ElementTree.tostring(record)
+
+
+def policy(id, packages=3, scripts=2, package_ids=100, script_ids=50,
+           categories=10, group_ids=50, seed=None):
+    """Returns the XML of a made up policy with id running that many
+    packages and scripts picked from ids 1 to package_ids and script_ids,
+    scoped to a group or two from ids 1 to group_ids and with one of
+    them excluded about half the time.
+    """
+    fake = _Fake(random.Random(id if seed is None else seed))
+    record = ElementTree.Element('policy')
+    cat = fake.rand.randrange(1, categories + 1)
+    _fill(record, fake, tools._pol_keys, tools._pol_convert_keys, {
+        'id': str(id),
+        'name': 'Policy %d' % id,
+        'trigger': 'EVENT',
+        'network': 'false',
+        'other': '',
+        'frequency': fake.choice(['Once per computer', 'Ongoing']),
+        'cat_id': str(cat),
+        'cat_name': 'Category %d' % cat,
+        'site_id': '-1',
+        'site_name': 'None',
+        'pak_count': str(packages),
+        'script_count': str(scripts),
+    })
+    _list(_set(record, 'package_configuration/packages', None), 'package', [
+        [['id', str(pak)], ['name', 'Package %d.pkg' % pak],
+         ['action', 'Install'], ['fut', 'false'], ['feu', 'false'],
+         ['autorun', 'false']]
+        for pak in fake.rand.sample(range(1, package_ids + 1),
+                                    min(packages, package_ids))])
+    _list(_set(record, 'scripts', None), 'script', [
+        [['id', str(scr)], ['name', 'script%d.sh' % scr],
+         ['priority', 'After']] +
+        [['parameter%d' % nn, ''] for nn in range(4, 12)]
+        for scr in fake.rand.sample(range(1, script_ids + 1),
+                                    min(scripts, script_ids))])
+    groups = fake.rand.sample(range(1, group_ids + 1), min(3, group_ids))
+    scope = _set(record, 'scope', None)
+    _set(scope, 'all_computers', 'false')
+    for path, ids in [
+            ['computer_groups', groups[:1 + fake.rand.randrange(2)]],
+            ['exclusions/computer_groups',
+             groups[2:2 + fake.rand.randrange(2)]]]:
+        parent = _set(scope, path, None)
+        for group in ids:
+            child = ElementTree.SubElement(parent, 'computer_group')
+            _set(child, 'id', str(group))
+            _set(child, 'name', 'Group %d' % group)
+    return ElementTree.tostring(record)
+
+
+def computergroup(id, members, smart=True, seed=None):
+    """Returns the XML of a made up computer group with id whose members
+    are the computers with the ids in members.
+    """
+    fake = _Fake(random.Random(id if seed is None else seed))
+    record = ElementTree.Element('computer_group')
+    for key, val in [['id', str(id)], ['name', 'Group %d' % id],
+                     ['is_smart', 'true' if smart else 'false'],
+                     ['site/id', '-1'], ['site/name', 'None']]:
+        _set(record, key, val)
+    _list(_set(record, 'criteria', None), 'criterion', [
+        [['name', 'Operating System Version'], ['priority', '0'],
+         ['and_or', 'and'], ['search_type', 'like'], ['value', '10.13']]]
+        if smart else [])
+    _list(_set(record, 'computers', None), 'computer', [
+        [['id', str(member)], ['name', 'Mac %d' % member],
+         ['mac_address', fake.mac()], ['alt_mac_address', fake.mac()],
+         ['serial', fake.serial()]]
+        for member in members])
+    return ElementTree.tostring(record)
+
+
+def package(id, categories=10, seed=None):
+    """Returns the XML of a made up package with id."""
+    fake = _Fake(random.Random(id if seed is None else seed))
+    record = ElementTree.Element('package')
+    _fill(record, fake, tools._packages_keys, tools._packages_convert_keys, {
+        'id': str(id),
+        'name': 'Package %d.pkg' % id,
+        'category': 'Category %d' % fake.rand.randrange(1, categories + 1),
+        'filename': 'Package %d.pkg' % id,
+        'info': '',
+        'notes': '',
+        'priority': '10',
+        'reboot': 'false',
+        'fut': 'false',
+        'feu': 'false',
+        'boot_req': 'true',
+        'uninstall': 'false',
+        'os_req': '',
+        'req_proc': 'None',
+        'switch_with_pak': 'Do Not Install',
+        'install_if_avail': 'false',
+        'reinstall': 'Do Not Reinstall',
+        'triggering': '',
+        'send_not': 'false',
+    })
+    return ElementTree.tostring(record)
+
+
+def script(id, categories=10, seed=None):
+    """Returns the XML of a made up script with id."""
+    fake = _Fake(random.Random(id if seed is None else seed))
+    record = ElementTree.Element('script')
+    _fill(record, fake, tools._script_keys, [], {
+        'id': str(id),
+        'name': 'script%d.sh' % id,
+        'category': 'Category %d' % fake.rand.randrange(1, categories + 1),
+        'filename': 'script%d.sh' % id,
+        'info': '',
+        'notes': '',
+        'priority': 'After',
+        'par4': '',
+        'par5': '',
+        'par6': '',
+        'contents': '#!/bin/sh\necho %d\n' % id,
+    })
+    return ElementTree.tostring(record)
+
+
+def category(id):
+    """Returns the XML of a made up category with id."""
+    record = ElementTree.Element('category')
+    for key, val in [['id', str(id)], ['name', 'Category %d' % id],
+                     ['priority', str(id % 20)]]:
+        _set(record, key, val)
+    return ElementTree.tostring(record)
+
+
+def fleet(computers=1000, mobile_devices=100, policies=200, groups=50,
+          packages=100, scripts=50, categories=10, apps=60, attributes=20,
+          seed=0):
+    """Yields (kind, id, xml) for every record of a made up fleet, kind
+    being the name the JSS uses in its URLs.
+    """
+    rand = random.Random(seed)
+    for id in range(1, computers + 1):
+        yield 'computers', id, computer(id, apps, attributes,
+                                        seed=rand.random())
+    for id in range(1, mobile_devices + 1):
+        yield 'mobiledevices', id, mobile_device(id, seed=rand.random())
+    for id in range(1, policies + 1):
+        yield 'policies', id, policy(id, package_ids=packages,
+                                     script_ids=scripts,
+                                     categories=categories,
+                                     group_ids=groups,
+                                     seed=rand.random())
+    ids = list(range(1, computers + 1))
+    for id in range(1, groups + 1):
+        members = rand.sample(ids, rand.randrange(len(ids) + 1))
+        yield 'computergroups', id, computergroup(id, sorted(members),
+                                                  seed=rand.random())
+    for id in range(1, packages + 1):
+        yield 'packages', id, package(id, categories, seed=rand.random())
+    for id in range(1, scripts + 1):
+        yield 'scripts', id, script(id, categories, seed=rand.random())
+    for id in range(1, categories + 1):
+        yield 'categories', id, category(id)
+
+
+def write_fleet(path, **kwargs):
+    """Writes a made up fleet (see fleet for the arguments) to a directory
+    laid out as <path>/<kind>/<id>.xml, ready for mock_jss.
+    """
+    for kind, id, xml in fleet(**kwargs):
+        folder = os.path.join(path, kind)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(os.path.join(folder, '%d.xml' % id), 'wb') as ff:
+            ff.write(xml)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[2:]]
+    kwargs = dict(zip(['computers', 'apps', 'attributes'], args))
+    write_fleet(sys.argv[1], **kwargs)
@@ -0,0 +1,159 @@
+#
+# jss_apps.py
+#
+# an index of the apps installed across the fleet built from
+# the output of c_apps.
+#
+"""An index of the apps installed across the whole fleet.
+
+Asking which Macs run Chrome older than 68 means walking every record's
+c_apps. AppIndex keeps them all indexed by app and version instead so the
+question is a handful of dictionary lookups. Names and versions are
+interned, 20,000 copies of 'Google Chrome' are one string.
+
+    index = AppIndex()
+    for result in iter_computers(j, [c_apps]):
+        index.add(result['id'], result['c_apps'])
+    print index.count('Google Chrome')
+    print index.outdated('Google Chrome', '68.0')
+    print index.missing('Google Chrome')
+
+When a record is fetched again just add() it again, only the apps that
+changed are touched. remove() a machine when it leaves the JSS.
+
+Versions are compared on their numbers alone, '68.0.3440.84' is
+(68, 0, 3440, 84), so '10.1b2' counts as newer than '10.1'.
+"""
+
+import re
+
+_number_re = re.compile(r'\d+')
+
+
+def version_key(version):
+    """Returns something that compares the way versions should, the
+    numbers in it as a tuple.
+    """
+    return tuple(int(nn) for nn in _number_re.findall(version or ''))
+
+
+class AppIndex(object):
+    """The apps on every machine, indexed by app and version. Build it by
+    calling add(id, apps) with the dictionary c_apps returns for each
+    machine.
+    """
+
+    def __init__(self):
+        # app -> version -> set of ids
+        self._apps = {}
+        # id -> {app: version} as it was last added
+        self._machines = {}
+        # version -> version_key(version), each is only worked out once
+        self._keys = {}
+        # one copy of each name and version, intern() won't take unicode
+        self._strings = {}
+
+    def __len__(self):
+        return len(self._machines)
+
+    def __contains__(self, id):
+        return str(id) in self._machines
+
+    def _intern(self, val):
+        return self._strings.setdefault(val, val)
+
+    def _key(self, version):
+        key = self._keys.get(version)
+        if key is None:
+            key = self._keys[version] = version_key(version)
+        return key
+
+    def _drop(self, id, app, version):
+        versions = self._apps[app]
+        ids = versions[version]
+        ids.discard(id)
+        if not ids:
+            del versions[version]
+            if not versions:
+                del self._apps[app]
+
+    def add(self, id, apps):
+        """Adds the apps (from c_apps) on the machine with id, replacing
+        what was there for it before.
+        """
+        id = self._intern(str(id))
+        old = self._machines.get(id, {})
+        new = {}
+        for app, version in apps.items():
+            app = self._intern(app)
+            version = self._intern(version)
+            new[app] = version
+            if app in old and old[app] == version:
+                continue
+            if app in old:
+                self._drop(id, app, old[app])
+            self._apps.setdefault(app, {}).setdefault(version, set()).add(id)
+        for app in old:
+            if app not in new:
+                self._drop(id, app, old[app])
+        self._machines[id] = new
+
+    def remove(self, id):
+        """Takes the machine with id out of the index."""
+        id = str(id)
+        for app, version in self._machines.pop(id, {}).items():
+            self._drop(id, app, version)
+
+    def machine(self, id):
+        """Returns the apps on the machine with id, like c_apps."""
+        return dict(self._machines.get(str(id), {}))
+
+    def apps(self):
+        """Returns the names of every app in the index."""
+        return list(self._apps)
+
+    def versions(self, app):
+        """Returns a dictionary of each version of app and how many
+        machines have it.
+        """
+        return dict((version, len(ids))
+                    for version, ids in self._apps.get(app, {}).items())
+
+    def count(self, app, version=None):
+        """Returns how many machines have app, or that version of it."""
+        versions = self._apps.get(app, {})
+        if version is not None:
+            return len(versions.get(version, ()))
+        return sum(len(ids) for ids in versions.values())
+
+    def machines(self, app, version=None):
+        """Returns the set of ids of the machines with app, or that version
+        of it.
+        """
+        versions = self._apps.get(app, {})
+        if version is not None:
+            return set(versions.get(version, ()))
+        return set().union(*versions.values())
+
+    def missing(self, app):
+        """Returns the set of ids of the machines without app."""
+        return set(self._machines).difference(*self._apps.get(app,
+                                                              {}).values())
+
+    def outdated(self, app, minimum):
+        """Returns the set of ids of the machines with a version of app
+        older than minimum.
+        """
+        minimum = version_key(minimum)
+        return set().union(*[ids for version, ids in
+                             self._apps.get(app, {}).items()
+                             if self._key(version) < minimum])
+
+    def outdated_count(self, app, minimum):
+        """Returns how many machines have a version of app older than
+        minimum.
+        """
+        minimum = version_key(minimum)
+        return sum(len(ids) for version, ids in
+                   self._apps.get(app, {}).items()
+                   if self._key(version) < minimum)
@@ -0,0 +1,288 @@
+#
+# jss_async.py
+#
+# an asyncio path to the JSS for when threads aren't enough.
+#
+"""An asyncio client for the JSS.
+
+When a sweep needs thousands of requests in flight, perhaps across
+several JSS instances, threads run out of steam. This talks HTTP to the
+JSS directly with asyncio and hands back the same XML python-jss does, so
+everything in jss_tools works on it unchanged.
+
+    async def main():
+        j = Jopen_async(limit=200)
+        for computer in await j.fetch_all('computers'):
+            info = c_info(computer)
+
+    asyncio.run(main())
+
+This needs python 3.7 or later, unlike the rest of jss_tools. Running it
+as a script load tests it against a mock JSS:
+`python3 jss_async.py <dir of xml> [limit] [latency]`
+"""
+
+import asyncio
+import base64
+import getpass
+import ssl
+import sys
+import time
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
+
+import jss
+
+# the JSS names for the records we know how to fetch, these go in the URL
+COMPUTERS = 'computers'
+MOBILE_DEVICES = 'mobiledevices'
+POLICIES = 'policies'
+COMPUTER_GROUPS = 'computergroups'
+MOBILE_DEVICE_GROUPS = 'mobiledevicegroups'
+
+
+class JSSError(Exception):
+    """The JSS answered with an HTTP error."""
+
+
+class AsyncJSS(object):
+    """A connection to one JSS. No more than `limit` requests are ever in
+    flight at once. The connections are kept open and used again by the
+    next request rather than paying for a new one (and a TLS handshake)
+    every time, await close() when you are done.
+    """
+
+    def __init__(self, url, user, password, limit=50, ssl_verify=True):
+        parts = urlsplit(url)
+        self.url = url.rstrip('/')
+        self.limit = limit
+        self._host = parts.hostname
+        self._ssl = None
+        if parts.scheme == 'https':
+            self._ssl = ssl.create_default_context()
+            if not ssl_verify:
+                self._ssl.check_hostname = False
+                self._ssl.verify_mode = ssl.CERT_NONE
+        self._port = parts.port or (443 if self._ssl else 80)
+        self._prefix = parts.path.rstrip('/') + '/JSSResource/'
+        self._auth = base64.b64encode(
+            ('%s:%s' % (user, password)).encode('utf-8')).decode('ascii')
+        self._sem = None
+        # connections the JSS left open, ready for the next request
+        self._idle = []
+        self._loop = None
+
+    async def request(self, method, path, body=None):
+        """Sends a request for a path under JSSResource, e.g.
+        'computers/id/64', and returns the body of the reply as bytes.
+        """
+        loop = asyncio.get_event_loop()
+        if loop is not self._loop:
+            # the slots and the connections left open belong to the loop
+            # they were made in, another asyncio.run needs its own
+            self._sem = asyncio.Semaphore(self.limit)
+            self._idle = []
+            self._loop = loop
+        async with self._sem:
+            return await self._send(method, path, body)
+
+    async def _send(self, method, path, body=None):
+        """Does the work of request once it has a slot, so that what
+        jss_stats times of it is the JSS and not the wait for a slot.
+        """
+        head = ('%s %s%s HTTP/1.1\r\n'
+                'Host: %s\r\n'
+                'Authorization: Basic %s\r\n'
+                'Accept: text/xml\r\n') % (
+                    method, self._prefix, path, self._host, self._auth)
+        if body is not None:
+            head += ('Content-Type: text/xml\r\n'
+                     'Content-Length: %d\r\n') % len(body)
+        data = head.encode('latin-1') + b'\r\n' + (body or b'')
+        while True:
+            reader, writer, fresh = await self._connection()
+            try:
+                writer.write(data)
+                await writer.drain()
+                status, keep, reply = await _read_reply(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if fresh:
+                    raise
+                # the JSS closed it while it sat idle, try a new one
+                continue
+            except BaseException:
+                writer.close()
+                raise
+            break
+        if keep:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        if status >= 400:
+            raise JSSError('%s %s: %d\n%s' % (method, path, status, reply))
+        return reply
+
+    async def _connection(self):
+        """Returns a reader, writer and whether it is new. One left open
+        by an earlier request is used if there is one, there are never
+        more than limit of them as each request holds one.
+        """
+        if self._idle:
+            return self._idle.pop() + (False,)
+        reader, writer = await asyncio.open_connection(
+            self._host, self._port, ssl=self._ssl)
+        return reader, writer, True
+
+    async def close(self):
+        """Closes the connections kept open for the next requests."""
+        while self._idle:
+            writer = self._idle.pop()[1]
+            writer.close()
+            await writer.wait_closed()
+
+    async def get(self, path):
+        """GETs a path under JSSResource, returns the raw XML."""
+        return await self.request('GET', path)
+
+    async def put(self, path, data):
+        """PUTs an ElementTree (or raw XML) to a path under JSSResource."""
+        if not isinstance(data, bytes):
+            data = ElementTree.tostring(data, encoding='UTF-8')
+        return await self.request('PUT', path, data)
+
+    async def list(self, kind):
+        """Returns the listing of kind (e.g. 'computers') as an array of
+        dictionaries, one for each record.
+        """
+        root = ElementTree.fromstring(await self.get(kind))
+        ar = []
+        for item in root:
+            if item.tag != 'size':
+                ar.append(dict((child.tag, child.text) for child in item))
+        return ar
+
+    async def fetch(self, kind, id, subset=None):
+        """Returns one record as an ElementTree, ready for c_info, m_info,
+        policy, computergroup and friends. Pass a subset from c_subset or
+        m_subset to fetch just the sections you need.
+        """
+        path = '%s/id/%s' % (kind, id)
+        if subset:
+            path += '/subset/' + '&'.join(subset)
+        return ElementTree.fromstring(await self.get(path))
+
+    async def fetch_all(self, kind, ids=None, subset=None):
+        """Returns every record of kind (or just those in ids) fetched
+        concurrently, in the same order as the listing or ids.
+        """
+        if ids is None:
+            ids = [item['id'] for item in await self.list(kind)]
+        return await asyncio.gather(
+            *[self.fetch(kind, id, subset) for id in ids])
+
+    async def iter_all(self, kind, ids=None, subset=None):
+        """Yields every record of kind (or just those in ids) as each one
+        arrives.
+        """
+        if ids is None:
+            ids = [item['id'] for item in await self.list(kind)]
+        for done in asyncio.as_completed(
+                [self.fetch(kind, id, subset) for id in ids]):
+            yield await done
+
+
+def _timed(request, record):
+    """Wraps AsyncJSS._send so that record(method, path, seconds) is
+    called for every request, timing it from when it got a slot rather
+    than from when it started waiting for one. jss_stats uses it.
+    """
+    async def timed(self, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            return await request(self, method, path, body)
+        finally:
+            record(method, path, time.perf_counter() - start)
+    timed.__wrapped__ = request
+    return timed
+
+
+async def _read_reply(reader):
+    """Returns the status, whether the connection can be used again and
+    the body of a reply.
+    """
+    line = await reader.readline()
+    if not line:
+        raise ConnectionResetError('the JSS closed the connection')
+    version, status = line.split()[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, val = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = val.strip()
+    # HTTP/1.1 keeps the connection open unless it is told otherwise
+    if version == b'HTTP/1.1':
+        keep = headers.get('connection', '').lower() != 'close'
+    else:
+        keep = headers.get('connection', '').lower() == 'keep-alive'
+    if 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        body = b''
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                break
+            body += await reader.readexactly(size)
+            await reader.readline()
+    else:
+        # the end of the body is the end of the connection
+        body = await reader.read()
+        keep = False
+    return int(status), keep, body
+
+
+def Jopen_async(pref=None, pword=None, limit=50):
+    """
+    The asyncio version of Jopen. Asks for your password, returns an
+    AsyncJSS. If you want to enter the URL and user pass it pref='True'.
+    If you are running non-interactive pass it pword='password'. No more
+    than `limit` requests will be in flight at once.
+    """
+    jss_prefs = jss.JSSPrefs()
+    if pref:
+        jss_prefs.url = input("URL: ")
+        jss_prefs.user = input("User: ")
+    if pword:
+        jss_prefs.password = pword
+    else:
+        jss_prefs.password = getpass.getpass()
+    return AsyncJSS(jss_prefs.url, jss_prefs.user, jss_prefs.password,
+                    limit, jss_prefs.verify)
+
+
+async def _load_test(url, limit):
+    import jss_tools as tools
+    j = AsyncJSS(url, 'mock', 'mock', limit)
+    start = time.time()
+    count = 0
+    async for computer in j.iter_all(COMPUTERS):
+        tools.c_info(computer)
+        count += 1
+    taken = time.time() - start
+    print('%d computers in %.2fs, %.0f a second with %d in flight' % (
+        count, taken, count / taken, limit))
+    await j.close()
+
+
+if __name__ == '__main__':
+    import mock_jss
+    server = mock_jss.MockJSS(sys.argv[1])
+    if len(sys.argv) > 3:
+        server.latency = float(sys.argv[3])
+    server.start()
+    asyncio.run(_load_test(server.url,
+                           int(sys.argv[2]) if len(sys.argv) > 2 else 50))
+    server.stop()
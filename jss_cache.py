@@ -0,0 +1,198 @@
+#
+# jss_cache.py
+#
+# keep the raw XML of computer and mobile device records on disk
+# so we only fetch the ones that have changed.
+#
+"""A cache of raw JSS records on disk.
+
+The query to the JSS is always the most expensive part of anything we
+do and most of the records we fetch haven't changed since last time.
+This keeps the raw XML of computer and mobile device records in a SQLite
+file keyed by id along with the record's last_contact_time (or
+last_inventory_update for iOS). A record is only fetched again when that
+has moved.
+
+    cache = RecordCache('records.db')
+    for entry in j.Computer():
+        computer = cached_computer(j, cache, entry['id'])
+        ...
+    print cache.stats()
+
+The cache is bounded to max_bytes of XML, the least recently used records
+go first when it is full.
+"""
+
+import sqlite3
+import threading
+from xml.etree import ElementTree
+
+COMPUTERS = 'computers'
+MOBILE_DEVICES = 'mobiledevices'
+
+# where to find the time a record last changed
+_stamp_keys = {
+    COMPUTERS: 'general/last_contact_time',
+    MOBILE_DEVICES: 'general/last_inventory_update',
+}
+
+
+class RecordCache(object):
+    """Raw XML records in a SQLite file at path, keyed by kind and id. It
+    is safe to share between threads. hits and misses count how often get
+    did and didn't have what you asked for.
+    """
+
+    def __init__(self, path, max_bytes=1 << 30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS records ('
+            'kind TEXT, id TEXT, stamp TEXT, used INTEGER, size INTEGER, '
+            'xml BLOB, PRIMARY KEY (kind, id))')
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS records_used ON records (used)')
+        self._used = self._db.execute(
+            'SELECT COALESCE(MAX(used), 0) FROM records').fetchone()[0]
+        self._bytes = self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM records').fetchone()[0]
+
+    def get(self, kind, id, stamp=None):
+        """Returns the raw XML of a record or None if we don't have it. If
+        you pass stamp you only get it back if it was stored with the same
+        stamp.
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT stamp, xml FROM records WHERE kind = ? AND id = ?',
+                (kind, str(id))).fetchone()
+            if row is None or (stamp is not None and row[0] != stamp):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._used += 1
+            self._db.execute(
+                'UPDATE records SET used = ? WHERE kind = ? AND id = ?',
+                (self._used, kind, str(id)))
+            # commit so the recency outlives us and the write lock doesn't
+            # hold up anyone else using the file
+            self._db.commit()
+            return bytes(row[1])
+
+    def put(self, kind, id, stamp, xml):
+        """Stores the raw XML of a record with its stamp, throwing out the
+        least recently used records if we are over max_bytes.
+        """
+        with self._lock:
+            old = self._db.execute(
+                'SELECT size FROM records WHERE kind = ? AND id = ?',
+                (kind, str(id))).fetchone()
+            if old:
+                self._bytes -= old[0]
+            self._used += 1
+            self._db.execute(
+                'INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)',
+                (kind, str(id), stamp, self._used, len(xml),
+                 sqlite3.Binary(xml)))
+            self._bytes += len(xml)
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        gone = []
+        for kind, id, size in self._db.execute(
+                'SELECT kind, id, size FROM records ORDER BY used'):
+            if self._bytes <= self.max_bytes:
+                break
+            gone.append((kind, id))
+            self._bytes -= size
+        self._db.executemany(
+            'DELETE FROM records WHERE kind = ? AND id = ?', gone)
+
+    def remove(self, kind, id):
+        """Throws a record out of the cache."""
+        with self._lock:
+            old = self._db.execute(
+                'SELECT size FROM records WHERE kind = ? AND id = ?',
+                (kind, str(id))).fetchone()
+            if old:
+                self._bytes -= old[0]
+                self._db.execute(
+                    'DELETE FROM records WHERE kind = ? AND id = ?',
+                    (kind, str(id)))
+                self._db.commit()
+
+    def raw_records(self, kind):
+        """Yields the raw XML of every record of kind in the cache, a
+        batch at a time so they aren't all in memory at once.
+        """
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    'SELECT rowid, xml FROM records WHERE kind = ? AND '
+                    'rowid > ? ORDER BY rowid LIMIT 500',
+                    (kind, last)).fetchall()
+            if not rows:
+                return
+            for rowid, xml in rows:
+                yield bytes(xml)
+            last = rows[-1][0]
+
+    def stats(self):
+        """Returns a dictionary with the hits, misses, entries and bytes."""
+        with self._lock:
+            entries = self._db.execute(
+                'SELECT COUNT(*) FROM records').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': entries, 'bytes': self._bytes}
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+def _cached(find, cache, kind, id, stamp, subset):
+    if stamp is None:
+        stamp = find(id, subset=['general']).findtext(_stamp_keys[kind])
+    if subset:
+        # kept apart from the whole records, and from other subsets
+        kind = '%s/subset/%s' % (kind, '&'.join(subset))
+    # with no stamp we can't tell if it has changed so always fetch it
+    if stamp:
+        raw = cache.get(kind, id, stamp)
+        if raw is not None:
+            return find(ElementTree.fromstring(raw))
+    # a copy, python-jss adds general to the list it is given
+    record = find(id, subset=list(subset)) if subset else find(id)
+    cache.put(kind, id, stamp, ElementTree.tostring(record))
+    return record
+
+
+def cached_computer(j, cache, id, stamp=None, subset=None):
+    """Returns the computer record with id, the same as j.Computer(id),
+    but only goes to the JSS for the whole record if its last_contact_time
+    has changed since it went in the cache. Pass the last_contact_time (or
+    any other stamp that changes when the record does, as long as you
+    always use the same one) in stamp if you already know it, otherwise we
+    ask the JSS for just the general section to find it. A record with no
+    stamp is always fetched. Pass a list of sections in subset to fetch
+    and keep just those.
+    """
+    return _cached(j.Computer, cache, COMPUTERS, int(id), stamp, subset)
+
+
+def cached_mobiledevice(j, cache, id, stamp=None, subset=None):
+    """Returns the mobile device record with id, the same as
+    j.MobileDevice(id), but only goes to the JSS for the whole record if
+    its last_inventory_update has changed since it went in the cache. Pass
+    the last_inventory_update in stamp if you already know it.
+    """
+    return _cached(j.MobileDevice, cache, MOBILE_DEVICES, int(id), stamp,
+                   subset)
@@ -0,0 +1,368 @@
+#
+# jss_fixtures.py
+#
+# capture a sweep of a real JSS, sanitised, into a zip file and
+# play it back later with no JSS at all.
+#
+"""Record a sweep of the JSS once, replay it as often as you like.
+
+capture() fetches every record of each kind from a real JSS, sanitises
+it the way sanitise.py does, replacing names, serials, addresses and the
+like with made up ones, and writes the raw XML to a zip file laid out as
+<kind>/<id>.xml, the same as a mock_jss directory, with the listings in
+listings/<kind>.xml. Each record is compressed on its own so one can be
+read without touching the rest, the zip's directory is the index.
+
+    capture(j, 'sweep.zip', workers=16)
+
+FixtureJSS stands in for jss.JSS() with the records from the archive, at
+the speed of the CPU rather than the network. Everything in jss_tools
+(and jss_fleet) works with it, the writes included, they change the
+records in memory and are counted in puts.
+
+    j = FixtureJSS('sweep.zip')
+    for entry in j.Computer():
+        info = c_info(j.Computer(entry['id']))
+
+The same made up value always replaces the same real one so a user has
+one name in every record they appear in. They are made with a secret
+that is new for each capture and isn't saved anywhere, so they can't be
+worked back to the real ones.
+"""
+
+import hashlib
+import hmac
+import os
+import sys
+import threading
+import zipfile
+from xml.etree import ElementTree
+
+import mock_jss
+from jss_fleet import _pool
+from jss_tools import _merge
+
+# what capture() fetches unless you tell it otherwise
+KINDS = [
+    'computers',
+    'mobiledevices',
+    'policies',
+    'computergroups',
+    'packages',
+    'scripts',
+    'categories',
+]
+
+# the tags that hold something personal wherever they are found, and what
+# sort of made up value replaces them
+_private = {
+    'username': 'user',
+    'real_name': 'person',
+    'realname': 'person',
+    'email_address': 'email',
+    'phone': 'phone',
+    'phone_number': 'phone',
+    'lost_mode_phone': 'phone',
+    'position': 'text',
+    'room': 'text',
+    'serial_number': 'serial',
+    'serial': 'serial',
+    'udid': 'serial',
+    'asset_tag': 'serial',
+    'barcode_1': 'serial',
+    'barcode_2': 'serial',
+    'mac_address': 'mac',
+    'alt_mac_address': 'mac',
+    'wifi_mac_address': 'mac',
+    'bluetooth_mac_address': 'mac',
+    'ip_address': 'ip',
+    'imei': 'number',
+    'iccid': 'number',
+    'meid': 'number',
+    'management_password_sha256': 'serial',
+    'home': 'text',
+}
+
+# names that are personal only in these places, the name of an app or an
+# extension attribute isn't
+_private_names = [
+    ['general/name', 'text'],
+    ['general/device_name', 'text'],
+    ['general/display_name', 'text'],
+    ['groups_accounts/local_accounts/user/name', 'user'],
+    ['computers/computer/name', 'text'],
+    ['mobile_devices/mobile_device/name', 'text'],
+]
+
+# the names that are personal in the listings of these kinds
+_private_listing_names = ['computers', 'mobiledevices']
+
+
+def _made_up(sort, val, key):
+    """Returns a made up value of sort in place of val, always the same
+    one for the same val and key.
+    """
+    digest = hmac.new(key, val.encode('utf-8'), hashlib.sha256).hexdigest()
+    if sort == 'user':
+        return 'user' + digest[:6]
+    if sort == 'person':
+        return 'Person ' + digest[:6].upper()
+    if sort == 'email':
+        return 'user%s@example.com' % digest[:6]
+    if sort == 'phone':
+        return '04' + str(int(digest[:8], 16))[:8]
+    if sort == 'serial':
+        return digest[:12].upper()
+    if sort == 'mac':
+        return ':'.join(digest[ii:ii + 2].upper() for ii in range(0, 12, 2))
+    if sort == 'ip':
+        return '10.%d.%d.%d' % (int(digest[:2], 16), int(digest[2:4], 16),
+                                int(digest[4:6], 16))
+    if sort == 'number':
+        return str(int(digest[:15], 16))[:15]
+    return 'text ' + digest[:6]
+
+
+def sanitise(kind, record, key):
+    """Replaces anything personal in a record (or a listing) of kind with
+    made up values made with the secret key and returns it.
+    """
+    # each element once, however many of the rules it matches
+    found = {}
+    for elem in record.iter():
+        sort = _private.get(elem.tag)
+        if sort is not None:
+            found[elem] = sort
+    for path, sort in _private_names:
+        for elem in record.findall(path):
+            found[elem] = sort
+    # the listing is <computers><computer><name>, the record has its name
+    # in general
+    if kind in _private_listing_names and record.tag == kind:
+        for item in record:
+            elem = item.find('name')
+            if elem is not None:
+                found[elem] = 'text'
+    for elem, sort in found.items():
+        if elem.text and elem.text.strip():
+            elem.text = _made_up(sort, elem.text, key)
+    return record
+
+
+def _keep(kind, record, key):
+    return record
+
+
+def _listing_name(kind, basic=False):
+    return 'listings/%s%s.xml' % (kind, '-basic' if basic else '')
+
+
+def capture(jss, path, kinds=None, workers=8, clean=sanitise, key=None):
+    """Fetches every record of each of kinds (default KINDS) from jss on a
+    pool of `workers` threads, runs clean(kind, record, key) over it (pass
+    clean=None to keep them as they are) and writes them all to a zip file
+    at path. key is the secret sanitise makes its values with, a random
+    one unless you pass your own, it isn't written to the zip. Returns a
+    dictionary of kind and how many records were saved.
+    """
+    if clean is None:
+        clean = _keep
+    if key is None:
+        key = os.urandom(32)
+    counts = {}
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for kind in kinds or KINDS:
+            listing = jss.get('/' + kind)
+            archive.writestr(_listing_name(kind), ElementTree.tostring(
+                clean(kind, listing, key)))
+            if kind == 'computers':
+                archive.writestr(
+                    _listing_name(kind, True), ElementTree.tostring(
+                        clean(kind, jss.get('/computers/subset/basic'), key)))
+            ids = [item.findtext('id') for item in listing
+                   if item.tag != 'size']
+            counts[kind] = 0
+            for id, record in _pool(
+                    lambda id: [id, jss.get('/%s/id/%s' % (kind, id))],
+                    ids, workers):
+                record = clean(kind, record, key)
+                archive.writestr('%s/%s.xml' % (kind, id),
+                                 ElementTree.tostring(record))
+                counts[kind] += 1
+    return counts
+
+
+class FixtureRecord(ElementTree.Element):
+    """A record from a FixtureJSS. save() writes it back to the fixture
+    the way python-jss writes one back to the JSS.
+    """
+
+    def save(self):
+        self.jss.put(self.url, self)
+
+
+class FixtureJSS(object):
+    """Stands in for jss.JSS() with the records in an archive written by
+    capture(). Computer(), MobileDevice(), Policy(), ComputerGroup(),
+    MobileDeviceGroup(), Package(), Script() and Category() work like they
+    do in python-jss: with no id you get the listing, as a list of
+    dictionaries, otherwise the record, and a subset can be asked for.
+    Hand them a record you already have as an ElementTree and you get it
+    back as one of ours.
+    Computer(subset='basic') gives the basic listing.
+
+    Records are only read and decompressed when they are asked for. What
+    the write routines send is merged into an in-memory copy of the record
+    so a later fetch sees it. puts counts them. It is safe to share
+    between threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.puts = 0
+        self._zip = zipfile.ZipFile(path)
+        self._names = set(self._zip.namelist())
+        # kind/id -> XML as changed by a put
+        self._changed = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        kind, id = key
+        return '%s/%s.xml' % (kind, id) in self._names
+
+    def kinds(self):
+        """Returns the kinds of record in the archive."""
+        return sorted(set(name.split('/')[0] for name in self._names
+                          if not name.startswith('listings/')))
+
+    def ids(self, kind):
+        """Returns the ids of the records of kind in the archive."""
+        prefix = kind + '/'
+        return sorted((name[len(prefix):-4] for name in self._names
+                       if name.startswith(prefix)), key=int)
+
+    def raw(self, kind, id):
+        """Returns the raw XML of a record, or None if it isn't there."""
+        name = '%s/%s.xml' % (kind, id)
+        with self._lock:
+            if name in self._changed:
+                return self._changed[name]
+            if name not in self._names:
+                return None
+            return self._zip.read(name)
+
+    def listing(self, kind, basic=False):
+        """Returns the listing of kind as a list of dictionaries."""
+        name = _listing_name(kind, basic)
+        with self._lock:
+            if name not in self._names:
+                raise KeyError(name)
+            root = ElementTree.fromstring(self._zip.read(name))
+        return [dict((child.tag, child.text) for child in item)
+                for item in root if item.tag != 'size']
+
+    def record(self, kind, id, subset=None):
+        """Returns a record as a FixtureRecord ready for the extractors,
+        cut down to subset (a list of section names) if you give one.
+        """
+        body = self.raw(kind, id)
+        if body is None:
+            raise KeyError('%s/%s' % (kind, id))
+        if subset:
+            body = mock_jss._subset(body, '&'.join(subset))
+        return self._record(kind, id, ElementTree.fromstring(body))
+
+    def _record(self, kind, id, root):
+        record = FixtureRecord(root.tag, root.attrib)
+        record.text = root.text
+        record.extend(list(root))
+        record.jss = self
+        record.url = '%s/id/%s' % (kind, id)
+        return record
+
+    def _find(self, kind, data=None, subset=None):
+        if subset == 'basic' and data is None:
+            return self.listing(kind, True)
+        if data is None:
+            return self.listing(kind)
+        if ElementTree.iselement(data):
+            # a record we already have, as python-jss takes it
+            return self._record(kind, data.findtext('general/id') or
+                                data.findtext('id'), data)
+        if isinstance(subset, str):
+            subset = subset.split('&')
+        return self.record(kind, data, subset)
+
+    def Computer(self, data=None, subset=None):
+        return self._find('computers', data, subset)
+
+    def MobileDevice(self, data=None, subset=None):
+        return self._find('mobiledevices', data, subset)
+
+    def Policy(self, data=None, subset=None):
+        return self._find('policies', data, subset)
+
+    def ComputerGroup(self, data=None, subset=None):
+        return self._find('computergroups', data, subset)
+
+    def MobileDeviceGroup(self, data=None, subset=None):
+        return self._find('mobiledevicegroups', data, subset)
+
+    def Package(self, data=None, subset=None):
+        return self._find('packages', data, subset)
+
+    def Script(self, data=None, subset=None):
+        return self._find('scripts', data, subset)
+
+    def Category(self, data=None, subset=None):
+        return self._find('categories', data, subset)
+
+    def get(self, url):
+        """Returns what is at a JSSResource url as an ElementTree, like
+        jss.JSS().get().
+        """
+        parts = url.split('JSSResource/')[-1].strip('/').split('/')
+        if len(parts) >= 3 and parts[1] == 'id':
+            subset = parts[4].split('&') if len(parts) == 5 else None
+            return self.record(parts[0], parts[2], subset)
+        with self._lock:
+            return ElementTree.fromstring(self._zip.read(
+                _listing_name(parts[0], parts[-1] == 'basic')))
+
+    def put(self, url, data):
+        """Merges data, an ElementTree, into the record at a JSSResource
+        url the way the JSS does.
+        """
+        parts = url.split('JSSResource/')[-1].strip('/').split('/')
+        name = '%s/%s.xml' % (parts[0], parts[2])
+        body = self.raw(parts[0], parts[2])
+        if body is None:
+            raise KeyError(name)
+        record = ElementTree.fromstring(body)
+        _merge(record, data)
+        with self._lock:
+            self._changed[name] = ElementTree.tostring(record)
+            self.puts += 1
+
+    def close(self):
+        self._zip.close()
+
+
+def _replay(path):
+    import time
+    import jss_tools as tools
+    from jss_fleet import iter_computers
+    j = FixtureJSS(path)
+    start = time.time()
+    count = 0
+    for result in iter_computers(
+            j, [tools.c_info, tools.c_apps, tools.c_attributes], workers=1):
+        count += 1
+    taken = time.time() - start
+    print('%d computers in %.2fs, %.0f a second' % (
+        count, taken, count / taken))
+
+
+if __name__ == '__main__':
+    # jss_fixtures.py sweep.zip
+    _replay(sys.argv[1])
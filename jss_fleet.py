@@ -0,0 +1,383 @@
+#
+# jss_fleet.py
+#
+# routines to work on the whole fleet at once rather than
+# one record at a time.
+#
+"""Routines to work with the whole fleet at once.
+
+The routines in jss_tools leave the query to you. These do the querying
+for you, for every record, on a pool of worker threads so a sweep of
+20,000 Macs isn't waiting on one round trip at a time.
+
+    for result in iter_computers(j, [c_info, c_attributes], workers=16):
+        print result['c_info']['serial']
+"""
+
+import multiprocessing
+import random
+import sys
+import threading
+import time
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from xml.etree import ElementTree
+
+import jss_tools as tools
+from jss_cache import cached_computer
+
+
+def _pool(work, items, workers=8, ordered=False):
+    """Runs work(item) for each item on a pool of worker threads and yields
+    the results as they finish, or in the order of items if ordered is True.
+    No more than 2 * workers items are ever in flight or waiting to be
+    yielded so memory stays bounded however many items there are. An
+    exception in work, or from items itself, is raised here and the pool
+    is shut down.
+    """
+    slots = threading.Semaphore(workers * 2)
+    tasks = queue.Queue()
+    done = queue.Queue()
+    stop = threading.Event()
+
+    def feed():
+        try:
+            for ii, item in enumerate(items):
+                slots.acquire()
+                if stop.is_set():
+                    break
+                tasks.put((ii, item))
+        except BaseException:
+            # the items themselves failed, a generator or the listing
+            # behind one, hand it on rather than leave everyone waiting
+            done.put((-1, None, sys.exc_info()[1]))
+        finally:
+            for _ in range(workers):
+                tasks.put(None)
+
+    def worker():
+        while True:
+            task = tasks.get()
+            if task is None:
+                done.put(None)
+                return
+            if stop.is_set():
+                continue
+            try:
+                done.put((task[0], work(task[1]), None))
+            except Exception:
+                done.put((task[0], None, sys.exc_info()[1]))
+
+    threads = [threading.Thread(target=feed)]
+    threads += [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    waiting = {}
+    next_ii = 0
+    running = workers
+    try:
+        while running:
+            got = done.get()
+            if got is None:
+                running -= 1
+                continue
+            ii, result, err = got
+            if err is not None:
+                raise err
+            if not ordered:
+                yield result
+                slots.release()
+                continue
+            waiting[ii] = result
+            while next_ii in waiting:
+                yield waiting.pop(next_ii)
+                next_ii += 1
+                slots.release()
+    finally:
+        stop.set()
+        # let the feeder see we have stopped if it is waiting on a slot
+        for _ in range(workers * 2):
+            slots.release()
+
+
+def _results(record, extractors, id=None):
+    # the id from the listing if we have it, a subset without the general
+    # section has no id of its own
+    if id is None:
+        id = record.findtext('general/id')
+    result = {'id': id}
+    for func in extractors:
+        result[func.__name__] = func(record)
+    return result
+
+
+def fetch_computer(jss, id, extractors):
+    """Returns the computer record with id holding just the sections the
+    functions in extractors read, which is a lot less to fetch and parse
+    than the whole record. If one of them isn't from jss_tools you get the
+    whole record.
+    """
+    return jss.Computer(int(id), subset=tools.c_subset(extractors))
+
+
+def fetch_mobiledevice(jss, id, extractors):
+    """Returns the mobile device record with id holding just the sections
+    the functions in extractors read.
+    """
+    return jss.MobileDevice(int(id), subset=tools.m_subset(extractors))
+
+
+def iter_computers(jss, extractors=None, workers=8, ordered=False,
+                   ids=None):
+    """Retrieves every computer in the JSS (or just those in ids) on a pool
+    of `workers` threads and yields a dictionary for each one as it
+    arrives. The dictionary has the key 'id' and a key for each function in
+    `extractors` (default [c_info]) named after the function holding what
+    it returned. Pass ordered=True to get them in id order. Only the
+    sections of each record the extractors need are fetched.
+    """
+    if not extractors:
+        extractors = [tools.c_info]
+    if ids is None:
+        entries = jss.Computer()
+    else:
+        entries = [{'id': id} for id in ids]
+    if ordered:
+        entries = sorted(entries, key=lambda entry: int(entry['id']))
+    return _pool(
+        lambda entry: _results(
+            fetch_computer(jss, entry['id'], extractors), extractors,
+            entry['id']),
+        entries, workers, ordered)
+
+
+def listing_stamps(jss):
+    """Returns a dictionary of the id of every computer in the JSS and its
+    report_date_utc, the last time it sent inventory, all from one request
+    for the basic listing.
+    """
+    return dict((str(entry['id']), entry.get('report_date_utc'))
+                for entry in jss.Computer(subset='basic'))
+
+
+def group_members(groups):
+    """Returns the ids of the computers in groups, a computergroup result
+    or a list of them, each id only once however many groups it is in.
+    """
+    if isinstance(groups, dict):
+        groups = [groups]
+    seen = set()
+    ids = []
+    for group in groups:
+        for computer in group['computers']:
+            if computer and computer['id'] not in seen:
+                seen.add(computer['id'])
+                ids.append(computer['id'])
+    return ids
+
+
+def expand_groups(jss, groups, extractors=None, workers=8, cache=None):
+    """Fetches the members of groups, a computergroup result or a list of
+    them, on a pool of `workers` threads and yields a dictionary for each
+    one like iter_computers does. A computer in more than one of the
+    groups is only fetched once, and only the sections the extractors need
+    are fetched. Pass a RecordCache in cache to share records between
+    runs, a record only comes from the JSS again if its report_date_utc
+    has changed, all of which come from one request for the basic
+    listing.
+    """
+    if not extractors:
+        extractors = [tools.c_info]
+    if cache is None:
+        def fetch(id):
+            return fetch_computer(jss, id, extractors)
+    else:
+        stamps = listing_stamps(jss)
+        subset = tools.c_subset(extractors)
+
+        def fetch(id):
+            return cached_computer(jss, cache, id, stamps.get(str(id)),
+                                   subset)
+    return _pool(lambda id: _results(fetch(id), extractors, id),
+                 group_members(groups), workers)
+
+
+# the extractors each extract_records worker runs, set once when it starts
+_worker_extractors = None
+
+
+def _start_worker(extractors):
+    global _worker_extractors
+    _worker_extractors = extractors
+
+
+def _extract_raw(raw):
+    return _results(ElementTree.fromstring(raw), _worker_extractors)
+
+
+def extract_records(raws, extractors=None, processes=None, chunksize=50,
+                    ordered=False, context=None):
+    """Runs extractors (default [c_info]) over raw XML records, from a
+    RecordCache or a capture say, on a pool of `processes` processes (one
+    for each CPU by default) and yields a dictionary for each one like
+    iter_computers does. Once the records are local the work is all
+    parsing and Convert, which one python process can only do on one core.
+    Records go to the workers `chunksize` at a time so the cost of handing
+    them over is shared. Pass ordered=True to get them in the order of
+    raws. The extractors have to be routines from a module, not lambdas,
+    they go to the workers by name. Pass a multiprocessing context in
+    context to choose how the workers are started.
+    """
+    if not extractors:
+        extractors = [tools.c_info]
+    pool = (context or multiprocessing).Pool(
+        processes, _start_worker, (extractors,))
+    try:
+        if ordered:
+            results = pool.imap(_extract_raw, raws, chunksize)
+        else:
+            results = pool.imap_unordered(_extract_raw, raws, chunksize)
+        for result in results:
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+class TokenBucket(object):
+    """Lets through `rate` requests a second on average with bursts of up
+    to `burst`. take() waits until there is a token. Safe to share between
+    threads.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def take(self):
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# HTTP status codes worth trying again
+_transient = [429, 500, 502, 503, 504]
+
+
+def _is_transient(err):
+    status = getattr(err, 'status_code', None)
+    if status is not None:
+        return status in _transient
+    # requests' connection errors and timeouts are all IOErrors
+    return isinstance(err, EnvironmentError)
+
+
+def _apply(jss, id, change, mobile, bucket):
+    if mobile:
+        info, info_write = tools.m_info, tools.m_info_write
+        attributes, attributes_write = (tools.m_attributes,
+                                        tools.m_attributes_write)
+        fetch = fetch_mobiledevice
+    else:
+        info, info_write = tools.c_info, tools.c_info_write
+        attributes, attributes_write = (tools.c_attributes,
+                                        tools.c_attributes_write)
+        fetch = fetch_computer
+    extractors = []
+    if 'info' in change:
+        extractors.append(info)
+    if 'attributes' in change:
+        extractors.append(attributes)
+    bucket.take()
+    record = fetch(jss, id, extractors)
+    with tools.EditSession() as edit:
+        if 'info' in change:
+            this_info = info(record)
+            this_info.update(change['info'])
+            info_write(this_info, record, minimal=True)
+        if 'attributes' in change:
+            attribs = attributes(record)
+            for nm, val in change['attributes'].items():
+                attribs[nm]['value'] = val
+            attributes_write(attribs, record, minimal=True)
+        if edit.writes:
+            bucket.take()
+    return edit.saves > 0
+
+
+def bulk_write(jss, changes, workers=8, rate=10, retries=3, backoff=1.0,
+               mobile=False):
+    """Applies changes to a lot of computers (or mobile devices if mobile
+    is True) at once. changes is an iterable of (id, change) pairs where
+    change is a dictionary with the key 'info' holding a dictionary of
+    c_info (or m_info) keys and their new values and/or the key
+    'attributes' holding a dictionary of extension attribute names and
+    their new values, e.g.
+    (64, {'info': {'building': 'HQ'}, 'attributes': {'SIP Enabled': True}})
+
+    Each record is fetched and written with the usual routines in a single
+    minimal PUT on a pool of `workers` threads. No more than `rate`
+    requests a second go to the JSS. A request that fails with a
+    connection error or a 429 or 5xx is tried again up to `retries` times,
+    waiting longer each time starting from `backoff` seconds.
+
+    Returns a dictionary keyed on id holding True if the record was
+    written, False if nothing had changed, or the exception that stopped
+    it.
+    """
+    bucket = TokenBucket(rate)
+
+    def work(item):
+        id, change = item
+        attempt = 0
+        while True:
+            try:
+                return id, _apply(jss, id, change, mobile, bucket)
+            except Exception as err:
+                if attempt >= retries or not _is_transient(err):
+                    return id, err
+            time.sleep(backoff * 2 ** attempt * random.uniform(1, 1.5))
+            attempt += 1
+
+    report = {}
+    for id, result in _pool(work, changes, workers):
+        report[id] = result
+    return report
+
+
+def _load_test(path, workers, latency):
+    import jss
+    import mock_jss
+    server = mock_jss.MockJSS(path, latency=latency).start()
+    j = jss.JSS(url=server.url, user='mock', password='mock')
+    start = time.time()
+    count = 0
+    for result in iter_computers(j, [tools.c_info], workers):
+        count += 1
+    taken = time.time() - start
+    server.stop()
+    print('%d computers in %.2fs, %.0f a second with %d workers' % (
+        count, taken, count / taken, workers))
+    print(server.stats())
+
+
+if __name__ == '__main__':
+    # jss_fleet.py dir [workers] [latency]
+    _load_test(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+               float(sys.argv[3]) if len(sys.argv) > 3 else 0)
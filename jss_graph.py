@@ -0,0 +1,263 @@
+#
+# jss_graph.py
+#
+# what uses what between policies, packages, scripts and
+# categories, built from the output of policy, package, script
+# and category.
+#
+"""What uses what between policies, packages, scripts, categories and
+the computer groups policies are scoped to.
+
+policy() tells you the packages and scripts a policy runs but not the
+other way round. Finding the policies that deploy a package, or what
+breaks if a script is deleted, means fetching and scanning every policy.
+PolicyGraph keeps both directions indexed instead so the answer is a
+dictionary lookup.
+
+    graph = PolicyGraph()
+    for entry in j.Policy():
+        graph.add_policy(policy(j.Policy(entry['id'])))
+    for entry in j.Package():
+        graph.add_package(package(j.Package(entry['id'])))
+    print graph.policies_with_package(12)
+    print graph.unused_packages()
+
+When a policy changes just add_policy() it again, only its own links are
+touched. Packages, scripts, policies and computer groups are known by
+their id, categories by their name as that is all packages and scripts
+give us.
+"""
+
+
+def _add(index, key, val):
+    index.setdefault(key, set()).add(val)
+
+
+def _discard(index, key, val):
+    vals = index.get(key)
+    if vals is not None:
+        vals.discard(val)
+        if not vals:
+            del index[key]
+
+
+def _ids(items):
+    """the ids of the packages, scripts or groups in a policy's 'paks',
+    'scripts' or 'groups', the first two hold [None] when there are none"""
+    return set(str(item['id']) for item in items or () if item)
+
+
+class PolicyGraph(object):
+    """The links between policies and the packages, scripts and categories
+    they use, and the computer groups they are scoped to or exclude,
+    indexed in both directions. Build it by calling add_policy,
+    add_package, add_script and add_category with what policy, package,
+    script and category return. Policies can be added without the packages
+    and scripts they use, missing() tells you which those are.
+    """
+
+    def __init__(self):
+        # id -> what policy/package/script returned, name -> category
+        self._policies = {}
+        self._packages = {}
+        self._scripts = {}
+        self._categories = {}
+        # policy id -> ids of its packages and scripts, and back
+        self._policy_paks = {}
+        self._policy_scripts = {}
+        self._pak_policies = {}
+        self._script_policies = {}
+        # policy id -> ids of the computer groups in its scope and those
+        # excluded from it, and back
+        self._policy_groups = {}
+        self._policy_excluded = {}
+        self._group_policies = {}
+        self._group_excluded = {}
+        # category name -> ids of what is in it
+        self._cat_policies = {}
+        self._cat_packages = {}
+        self._cat_scripts = {}
+
+    def __len__(self):
+        return len(self._policies)
+
+    def add_policy(self, policy):
+        """Adds a policy (from policy), replacing what was there for it
+        before.
+        """
+        id = str(policy['id'])
+        self.remove_policy(id)
+        self._policies[id] = policy
+        paks = self._policy_paks[id] = _ids(policy['paks'])
+        scripts = self._policy_scripts[id] = _ids(policy['scripts'])
+        for pak in paks:
+            _add(self._pak_policies, pak, id)
+        for script in scripts:
+            _add(self._script_policies, script, id)
+        groups = self._policy_groups[id] = _ids(policy.get('groups'))
+        excluded = self._policy_excluded[id] = _ids(
+            policy.get('excluded_groups'))
+        for group in groups:
+            _add(self._group_policies, group, id)
+        for group in excluded:
+            _add(self._group_excluded, group, id)
+        if policy['cat_name']:
+            _add(self._cat_policies, policy['cat_name'], id)
+
+    def remove_policy(self, id):
+        """Takes the policy with id out of the graph."""
+        id = str(id)
+        policy = self._policies.pop(id, None)
+        if policy is None:
+            return
+        for pak in self._policy_paks.pop(id):
+            _discard(self._pak_policies, pak, id)
+        for script in self._policy_scripts.pop(id):
+            _discard(self._script_policies, script, id)
+        for group in self._policy_groups.pop(id):
+            _discard(self._group_policies, group, id)
+        for group in self._policy_excluded.pop(id):
+            _discard(self._group_excluded, group, id)
+        _discard(self._cat_policies, policy['cat_name'], id)
+
+    def add_package(self, package):
+        """Adds a package (from package), replacing what was there for it
+        before.
+        """
+        id = str(package['id'])
+        self.remove_package(id)
+        self._packages[id] = package
+        if package['category']:
+            _add(self._cat_packages, package['category'], id)
+
+    def remove_package(self, id):
+        """Takes the package with id out of the graph. Policies that use it
+        still link to it, see missing().
+        """
+        package = self._packages.pop(str(id), None)
+        if package is not None:
+            _discard(self._cat_packages, package['category'], str(id))
+
+    def add_script(self, script):
+        """Adds a script (from script), replacing what was there for it
+        before.
+        """
+        id = str(script['id'])
+        self.remove_script(id)
+        self._scripts[id] = script
+        if script['category']:
+            _add(self._cat_scripts, script['category'], id)
+
+    def remove_script(self, id):
+        """Takes the script with id out of the graph. Policies that use it
+        still link to it, see missing().
+        """
+        script = self._scripts.pop(str(id), None)
+        if script is not None:
+            _discard(self._cat_scripts, script['category'], str(id))
+
+    def add_category(self, category):
+        """Adds a category (from category)."""
+        self._categories[category['name']] = category
+
+    def remove_category(self, name):
+        """Takes the category called name out of the graph."""
+        self._categories.pop(name, None)
+
+    def policy(self, id):
+        """Returns what policy said for the policy with id, or None."""
+        return self._policies.get(str(id))
+
+    def package(self, id):
+        """Returns what package said for the package with id, or None."""
+        return self._packages.get(str(id))
+
+    def script(self, id):
+        """Returns what script said for the script with id, or None."""
+        return self._scripts.get(str(id))
+
+    def category(self, name):
+        """Returns what category said for the category called name, or
+        None.
+        """
+        return self._categories.get(name)
+
+    def policies_with_package(self, id):
+        """Returns the set of ids of the policies that deploy the package
+        with id.
+        """
+        return set(self._pak_policies.get(str(id), ()))
+
+    def policies_with_script(self, id):
+        """Returns the set of ids of the policies that run the script with
+        id, the ones that break if it is deleted.
+        """
+        return set(self._script_policies.get(str(id), ()))
+
+    def packages_of(self, id):
+        """Returns the set of ids of the packages the policy with id
+        deploys.
+        """
+        return set(self._policy_paks.get(str(id), ()))
+
+    def scripts_of(self, id):
+        """Returns the set of ids of the scripts the policy with id runs."""
+        return set(self._policy_scripts.get(str(id), ()))
+
+    def groups_of(self, id):
+        """Returns the set of ids of the computer groups the policy with id
+        is scoped to.
+        """
+        return set(self._policy_groups.get(str(id), ()))
+
+    def excluded_from(self, id):
+        """Returns the set of ids of the computer groups excluded from the
+        scope of the policy with id.
+        """
+        return set(self._policy_excluded.get(str(id), ()))
+
+    def policies_for_group(self, id):
+        """Returns the set of ids of the policies scoped to the computer
+        group with id.
+        """
+        return set(self._group_policies.get(str(id), ()))
+
+    def policies_excluding(self, id):
+        """Returns the set of ids of the policies that exclude the computer
+        group with id from their scope.
+        """
+        return set(self._group_excluded.get(str(id), ()))
+
+    def in_category(self, name):
+        """Returns a dictionary with the sets of ids of the 'policies',
+        'packages' and 'scripts' in the category called name.
+        """
+        return {'policies': set(self._cat_policies.get(name, ())),
+                'packages': set(self._cat_packages.get(name, ())),
+                'scripts': set(self._cat_scripts.get(name, ()))}
+
+    def unused_packages(self):
+        """Returns the set of ids of the packages no policy deploys."""
+        return set(id for id in self._packages
+                   if id not in self._pak_policies)
+
+    def unused_scripts(self):
+        """Returns the set of ids of the scripts no policy runs."""
+        return set(id for id in self._scripts
+                   if id not in self._script_policies)
+
+    def missing(self):
+        """Returns a dictionary with the sets of ids of the 'packages' and
+        'scripts' policies use that haven't been added (or have been
+        removed), and the names of the 'categories' used that haven't.
+        """
+        categories = set(self._cat_policies)
+        categories.update(self._cat_packages, self._cat_scripts)
+        return {
+            'packages': set(id for id in self._pak_policies
+                            if id not in self._packages),
+            'scripts': set(id for id in self._script_policies
+                           if id not in self._scripts),
+            'categories': set(name for name in categories
+                              if name not in self._categories),
+        }
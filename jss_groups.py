@@ -0,0 +1,263 @@
+#
+# jss_groups.py
+#
+# an index of computer group membership built from the output
+# of computergroup.
+#
+"""An index of which computers are in which groups.
+
+computergroup gives the members of one group, c_groups the groups of one
+computer. Asking which Macs are in one group but not another means
+fetching every member again. GroupIndex keeps the members of every group
+as a bitset, a python int with a bit set for each computer id, so union,
+intersection and difference across groups are a single operation on a
+few kilobytes however big the fleet is.
+
+    index = GroupIndex()
+    for group in j.ComputerGroup():
+        index.add(computergroup(j.ComputerGroup(group['id'])))
+    print index.difference('All Managed Clients', 'Sierra Upgraded')
+    print index.groups_of(64)
+
+union, intersection and difference hand back Members, which works like
+a frozenset of ids but stays a bitset until you look inside it, so the
+cost of turning bits into ids is only paid for the results you use.
+
+When a group is fetched again just add() it again, only the machines that
+joined or left have their list of groups changed. Groups can be named by
+their id or their name.
+"""
+
+try:
+    from collections.abc import Set
+except ImportError:
+    from collections import Set
+
+
+def _positions(bits):
+    """Returns a list of the number of each bit set in bits, lowest
+    first.
+    """
+    # bin() reversed has bit n at index n
+    text = bin(bits)[:1:-1]
+    if text.count('1') * 8 > len(text):
+        # most of them are set, a comprehension over them all is quicker
+        return [ii for ii, bit in enumerate(text) if bit == '1']
+    # otherwise find() skips the runs of zeros in C and we only go round
+    # once for each bit that is set
+    found = []
+    pos = text.find('1')
+    while pos >= 0:
+        found.append(pos)
+        pos = text.find('1', pos + 1)
+    return found
+
+
+def _make_bits(ids):
+    """Returns a bitset with the bit for each id in ids set."""
+    if not ids:
+        return 0
+    # build the binary digits and convert once, setting the bits one at a
+    # time copies the whole int for each of them
+    digits = bytearray(b'0') * (max(ids) + 1)
+    for id in ids:
+        digits[id] = ord('1')
+    digits.reverse()
+    return int(bytes(digits), 2)
+
+
+def _count(bits):
+    return bin(bits).count('1')
+
+
+class Members(Set):
+    """The ids of some computers, as strings like the JSS gives them, kept
+    as a bitset (bit n set if the computer with id n is in it). It works
+    like a frozenset: len(), in, iterating and comparing with a set all do
+    what you would expect, and |, & and - with another Members are done on
+    the bits. Only iterating turns the bits into ids, set(members) gives
+    you a real set. The bitset itself is in bits.
+    """
+
+    __slots__ = ('bits',)
+
+    def __init__(self, bits=0):
+        self.bits = bits
+
+    @classmethod
+    def _from_iterable(cls, ids):
+        # what the Set mixins make when the other side isn't a Members
+        return set(ids)
+
+    def __len__(self):
+        return _count(self.bits)
+
+    def __contains__(self, id):
+        try:
+            id = int(id)
+        except (TypeError, ValueError):
+            return False
+        return id >= 0 and bool(self.bits >> id & 1)
+
+    def __iter__(self):
+        return iter(map(str, _positions(self.bits)))
+
+    def __or__(self, other):
+        if isinstance(other, Members):
+            return Members(self.bits | other.bits)
+        return Set.__or__(self, other)
+
+    def __and__(self, other):
+        if isinstance(other, Members):
+            return Members(self.bits & other.bits)
+        return Set.__and__(self, other)
+
+    def __sub__(self, other):
+        if isinstance(other, Members):
+            return Members(self.bits & ~other.bits)
+        return Set.__sub__(self, other)
+
+    def __xor__(self, other):
+        if isinstance(other, Members):
+            return Members(self.bits ^ other.bits)
+        return Set.__xor__(self, other)
+
+    def __eq__(self, other):
+        if isinstance(other, Members):
+            return self.bits == other.bits
+        return Set.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        # the same as a frozenset of the ids, as they compare equal, which
+        # means going through them
+        return Set._hash(self)
+
+    def __repr__(self):
+        return 'Members(%r)' % sorted(self, key=int)
+
+
+class GroupIndex(object):
+    """The members of every computer group as bitsets and the groups of
+    every computer. Build it by calling add(group) with the dictionary
+    computergroup returns for each group.
+    """
+
+    def __init__(self):
+        # group id -> bitset of computer ids
+        self._groups = {}
+        # group id -> name and name -> group id
+        self._names = {}
+        self._ids = {}
+        # computer id -> set of group ids
+        self._machines = {}
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __contains__(self, group):
+        return self._gid(group) in self._groups
+
+    def _gid(self, group):
+        gid = self._ids.get(group)
+        if gid is None:
+            gid = str(group)
+        return gid
+
+    def _bits(self, group):
+        gid = self._gid(group)
+        if gid not in self._groups:
+            raise KeyError(group)
+        return self._groups[gid]
+
+    def add(self, group):
+        """Adds a group (from computergroup), replacing what was there for
+        it before. The members are all read to make the bitset but only
+        the computers that joined or left have their groups changed.
+        """
+        gid = str(group['id'])
+        old = self._groups.get(gid, 0)
+        bits = _make_bits([int(computer['id'])
+                           for computer in group['computers'] if computer])
+        for id in _positions(bits & ~old):
+            self._machines.setdefault(id, set()).add(gid)
+        for id in _positions(old & ~bits):
+            self._leave(id, gid)
+        self._groups[gid] = bits
+        if gid in self._names:
+            self._ids.pop(self._names[gid], None)
+        self._names[gid] = group['name']
+        self._ids[group['name']] = gid
+
+    def _leave(self, id, gid):
+        gids = self._machines[id]
+        gids.discard(gid)
+        if not gids:
+            del self._machines[id]
+
+    def remove(self, group):
+        """Takes the group out of the index."""
+        gid = self._gid(group)
+        for id in _positions(self._groups.pop(gid, 0)):
+            self._leave(id, gid)
+        self._ids.pop(self._names.pop(gid, None), None)
+
+    def groups(self):
+        """Returns a dictionary of the id and name of every group."""
+        return dict(self._names)
+
+    def groups_of(self, id):
+        """Returns the set of ids of the groups the computer with id is
+        in.
+        """
+        return set(self._machines.get(int(id), ()))
+
+    def members(self, group):
+        """Returns the ids of the computers in group as Members."""
+        return Members(self._bits(group))
+
+    def count(self, group):
+        """Returns how many computers are in group."""
+        return _count(self._bits(group))
+
+    def is_member(self, id, group):
+        """Returns True if the computer with id is in group."""
+        return bool(self._bits(group) >> int(id) & 1)
+
+    def bits(self, group):
+        """Returns the bitset of the computers in group, bit n is set if
+        the computer with id n is in it. Combine them with | & and & ~
+        and turn the result into ids with ids().
+        """
+        return self._bits(group)
+
+    def ids(self, bits):
+        """Returns the ids of the computers in a bitset as Members."""
+        return Members(bits)
+
+    def union(self, *groups):
+        """Returns the ids of the computers in any of groups as Members."""
+        bits = 0
+        for group in groups:
+            bits |= self._bits(group)
+        return Members(bits)
+
+    def intersection(self, group, *others):
+        """Returns the ids of the computers in all of the groups as
+        Members.
+        """
+        bits = self._bits(group)
+        for other in others:
+            bits &= self._bits(other)
+        return Members(bits)
+
+    def difference(self, group, *others):
+        """Returns the ids of the computers in group but none of the
+        others as Members.
+        """
+        bits = self._bits(group)
+        for other in others:
+            bits &= ~self._bits(other)
+        return Members(bits)
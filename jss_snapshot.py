@@ -0,0 +1,354 @@
+#
+# jss_snapshot.py
+#
+# save what the extractors made of the whole fleet so tomorrow's
+# reports don't have to ask the JSS again.
+#
+"""Snapshots of the fleet on disk.
+
+A snapshot holds what the extractors (c_info, c_attributes, c_apps,
+c_groups, c_profiles by default) returned for every computer in a SQLite
+file, one row per machine, pickled and compressed. The apps are kept
+apart: every app name and version is stored once in a table of strings
+and each machine holds an array of codes into it, so loading doesn't
+make a dictionary of apps for every machine until you look at one.
+Loading 20,000 machines back takes a fraction of a second and you can
+read a single machine without loading the rest.
+
+    take_snapshot(j, 'fleet.db')
+    ...
+    snap = Snapshot('fleet.db')
+    fleet = snap.load()
+    print fleet['64']['c_info']['serial']
+    print snap.get(64)['c_apps']
+
+Each machine is also stored with its stamp, the report_date_utc it had
+when it was taken, so sync() can fetch only the machines that have sent
+new inventory since.
+
+    snap = Snapshot('fleet.db')
+    print sync(j, snap)
+"""
+
+import array
+import datetime
+import gc
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+import jss_tools as tools
+from jss_fleet import iter_computers, listing_stamps
+
+# bump this when what goes in a snapshot changes, and teach _upgrade how
+# to bring an older one up to date
+FORMAT = 3
+
+# what take_snapshot saves unless you tell it otherwise
+EXTRACTORS = [
+    tools.c_info,
+    tools.c_attributes,
+    tools.c_apps,
+    tools.c_groups,
+    tools.c_profiles,
+]
+
+
+def _pack(outputs):
+    # protocol 2 so python 2 and 3 can read each other's snapshots
+    return sqlite3.Binary(zlib.compress(pickle.dumps(outputs, 2), 1))
+
+
+def _unpack(data):
+    data = zlib.decompress(bytes(data))
+    if sys.version_info[0] > 2:
+        # what python 2 pickled as str, datetimes included, comes back
+        # as it was
+        return pickle.loads(data, encoding='latin1')
+    return pickle.loads(data)
+
+
+# the apps aren't compressed, starting zlib takes longer than reading them
+def _pack_apps(codes):
+    if sys.version_info[0] < 3:
+        return sqlite3.Binary(codes.tostring())
+    return sqlite3.Binary(codes.tobytes())
+
+
+def _unpack_apps(data):
+    codes = array.array('i')
+    data = bytes(data)
+    if sys.version_info[0] < 3:
+        codes.fromstring(data)
+    else:
+        codes.frombytes(data)
+    return codes
+
+
+class _Apps(Mapping):
+    """What c_apps returned for one machine as it comes out of a
+    snapshot, codes into the snapshot's strings for each name and version.
+    It works like the dictionary it was, read only, and only becomes one
+    when you look inside it.
+    """
+
+    __slots__ = ('_strings', '_codes', '_apps')
+
+    def __init__(self, strings, codes):
+        self._strings = strings
+        self._codes = codes
+        self._apps = None
+
+    def _dict(self):
+        if self._apps is None:
+            lookup = self._strings.__getitem__
+            self._apps = dict(zip(map(lookup, self._codes[0::2]),
+                                  map(lookup, self._codes[1::2])))
+        return self._apps
+
+    def __getitem__(self, name):
+        return self._dict()[name]
+
+    def __iter__(self):
+        return iter(self._dict())
+
+    def __len__(self):
+        return len(self._codes) // 2
+
+    def __repr__(self):
+        return repr(self._dict())
+
+    def __reduce__(self):
+        # pickle it as the dictionary it stands for
+        return dict, (self._dict(),)
+
+
+def _upgrade(db, old):
+    """Brings a snapshot written in format old up to FORMAT."""
+    if old < 2:
+        # the stamps were last_contact_time, now they are report_date_utc,
+        # forget them so the next sync fetches every machine again
+        db.execute('UPDATE machines SET stamp = NULL')
+    columns = [row[1] for row in db.execute('PRAGMA table_info(machines)')]
+    if old < 3 and 'apps' not in columns:
+        # the machines already there keep their apps in data
+        db.execute('ALTER TABLE machines ADD COLUMN apps BLOB')
+    db.execute("UPDATE meta SET value = ? WHERE key = 'format'", (FORMAT,))
+    db.commit()
+
+
+class Snapshot(object):
+    """A fleet snapshot in a SQLite file at path, created if it isn't
+    there. It is safe to share between threads. A snapshot from an older
+    version of this is brought up to date, raises ValueError if the file
+    was written by a newer version.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS machines ('
+            'id INTEGER PRIMARY KEY, stamp TEXT, data BLOB, apps BLOB)')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS strings ('
+            'code INTEGER PRIMARY KEY, value TEXT)')
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = 'format'").fetchone()
+        if row is None:
+            self._db.execute(
+                "INSERT INTO meta VALUES ('format', ?)", (FORMAT,))
+            self._db.execute(
+                "INSERT INTO meta VALUES ('created', ?)", (time.time(),))
+            self._db.commit()
+        elif int(row[0]) > FORMAT:
+            raise ValueError('%s is snapshot format %s, we only know %d' % (
+                path, row[0], FORMAT))
+        elif int(row[0]) < FORMAT:
+            _upgrade(self._db, int(row[0]))
+        self._read_strings()
+
+    def _read_strings(self):
+        # the app names and versions, a string's code is its place in the
+        # list, only ever added to so an _Apps can keep hold of it
+        self._strings = [value for value, in self._db.execute(
+            'SELECT value FROM strings ORDER BY code')]
+        self._codes = dict((value, code)
+                           for code, value in enumerate(self._strings))
+
+    def _code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._strings)
+            self._strings.append(value)
+            self._db.execute('INSERT INTO strings VALUES (?, ?)',
+                             (code, value))
+        return code
+
+    def _row(self, id, outputs, stamp):
+        apps = outputs.get('c_apps')
+        if apps is None:
+            return int(id), stamp, _pack(outputs), None
+        codes = array.array('i')
+        for name, version in apps.items():
+            codes.append(self._code(name))
+            codes.append(self._code(version))
+        outputs = dict(outputs)
+        del outputs['c_apps']
+        return int(id), stamp, _pack(outputs), _pack_apps(codes)
+
+    def _outputs(self, data, apps):
+        outputs = _unpack(data)
+        if apps is not None:
+            outputs['c_apps'] = _Apps(self._strings, _unpack_apps(apps))
+        return outputs
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM machines').fetchone()[0]
+
+    def __contains__(self, id):
+        with self._lock:
+            return self._db.execute(
+                'SELECT 1 FROM machines WHERE id = ?',
+                (int(id),)).fetchone() is not None
+
+    @property
+    def created(self):
+        """When the snapshot was first written, as a datetime."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = 'created'").fetchone()
+        return datetime.datetime.fromtimestamp(float(row[0]))
+
+    def put(self, id, outputs, stamp=None):
+        """Saves outputs, a dictionary of extractor name and what it
+        returned, for the machine with id.
+        """
+        self.put_many([[id, outputs, stamp]])
+
+    def put_many(self, items):
+        """Saves an iterable of [id, outputs, stamp] all in one go, which is
+        much faster than a put for each.
+        """
+        with self._lock:
+            try:
+                rows = [self._row(id, outputs, stamp)
+                        for id, outputs, stamp in items]
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO machines VALUES (?, ?, ?, ?)',
+                    rows)
+                self._db.commit()
+            except Exception:
+                # the new strings are gone from the file, so from us too
+                self._db.rollback()
+                self._read_strings()
+                raise
+
+    def get(self, id):
+        """Returns what was saved for the machine with id, or None."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT data, apps FROM machines WHERE id = ?',
+                (int(id),)).fetchone()
+        if row is None:
+            return None
+        return self._outputs(row[0], row[1])
+
+    def remove(self, ids):
+        """Throws the machines in ids out of the snapshot."""
+        with self._lock:
+            self._db.executemany('DELETE FROM machines WHERE id = ?',
+                                 [(int(id),) for id in ids])
+            self._db.commit()
+
+    def stamps(self):
+        """Returns a dictionary of each machine's id and stamp."""
+        with self._lock:
+            return dict((str(id), stamp) for id, stamp in self._db.execute(
+                'SELECT id, stamp FROM machines'))
+
+    def load(self):
+        """Returns everything in the snapshot as a dictionary keyed on id
+        (as a string, like the JSS gives it) of dictionaries of extractor
+        name and what it returned. c_apps is a read only mapping that only
+        becomes a dictionary when you look at it.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT id, data, apps FROM machines').fetchall()
+        # unpickling makes a great many dictionaries and lists, the garbage
+        # collector would go over them again and again for nothing
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return dict((str(id), self._outputs(data, apps))
+                        for id, data, apps in rows)
+        finally:
+            if enabled:
+                gc.enable()
+
+    def close(self):
+        self._db.close()
+
+
+def sync(jss, snap, extractors=None, workers=8, full=False):
+    """Brings a Snapshot up to date with the JSS, only fetching what has
+    changed. One request for the basic listing gives the id and
+    report_date_utc of every computer, only those that are new or whose
+    report date has moved since they were saved are fetched and run
+    through the extractors (default EXTRACTORS) again and those no longer
+    in the JSS are dropped. A machine with no report date is always
+    fetched. Use the same extractors every time. Pass full=True to fetch
+    everything.
+
+    Returns a dictionary with how many machines were 'added', 'changed',
+    'removed' and 'unchanged'.
+    """
+    listing = listing_stamps(jss)
+    saved = snap.stamps()
+    added = [id for id in listing if id not in saved]
+    # with no report date we can't tell if it has changed, like the
+    # records with no stamp in jss_cache, so fetch it every time
+    changed = [id for id in listing
+               if id in saved and (full or not listing[id]
+                                   or saved[id] != listing[id])]
+    removed = [id for id in saved if id not in listing]
+    batch = []
+    for result in iter_computers(jss, extractors or EXTRACTORS, workers,
+                                 ids=added + changed):
+        id = result.pop('id')
+        batch.append([id, result, listing[id]])
+        if len(batch) >= 1000:
+            snap.put_many(batch)
+            batch = []
+    snap.put_many(batch)
+    snap.remove(removed)
+    return {'added': len(added), 'changed': len(changed),
+            'removed': len(removed),
+            'unchanged': len(listing) - len(added) - len(changed)}
+
+
+def take_snapshot(jss, path, extractors=None, workers=8):
+    """Runs extractors (default EXTRACTORS) over every computer in the JSS
+    and saves the lot to a snapshot at path. Anything already in the
+    snapshot is replaced and machines no longer in the JSS are dropped.
+    Returns the Snapshot. Use sync to keep it up to date after that.
+    """
+    snap = Snapshot(path)
+    sync(jss, snap, extractors, workers, full=True)
+    return snap
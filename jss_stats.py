@@ -0,0 +1,245 @@
+#
+# jss_stats.py
+#
+# count and time the extractors, Convert and the requests to the
+# JSS so we can see where a slow sweep spends its time.
+#
+"""Where the time goes.
+
+When a sweep is slow it could be the JSS, ElementTree, the date parsing
+in Convert or the saves. enable() swaps every extractor and write routine
+in jss_tools, Convert and Convert_back, and the requests python-jss (and
+jss_async) send, for versions that count and time each call. disable()
+puts the originals back so when it is off nothing is slowed down at all.
+
+    stats = jss_stats.enable()
+    for result in iter_computers(j, [c_info, c_apps]):
+        ...
+    jss_stats.disable()
+    print stats.format()
+
+Convert and Convert_back are broken down by type code ('Convert DATE')
+and requests by method and record kind ('GET computers'). For each you
+get the calls, the total and mean time and the 50th, 90th and 99th
+percentiles, worked out from a sample of up to 1,000 calls.
+
+Only calls made through the module are seen, a function you took a
+reference to before enable() (from jss_tools import c_info) isn't timed.
+"""
+
+import functools
+import random
+import threading
+import time
+
+import jss
+import jss_tools as tools
+try:
+    import jss_async
+except (ImportError, SyntaxError):
+    # it needs python 3.7
+    jss_async = None
+
+# perf_counter where we have it, it is far finer than time() on some boxes
+_clock = getattr(time, 'perf_counter', time.time)
+
+# what gets timed in jss_tools
+EXTRACTORS = [
+    'c_info', 'c_apps', 'c_attributes', 'c_groups', 'c_users',
+    'c_certificates', 'c_profiles', 'c_stream', 'package', 'policy',
+    'script', 'computergroup', 'category', 'm_devices', 'm_info',
+    'm_attributes', 'm_security', 'm_network',
+]
+
+WRITERS = [
+    'c_info_write', 'c_attributes_write', 'c_remote', 'm_info_write',
+    'm_attributes_write',
+]
+
+# the python-jss methods that send a request
+_requests = ['get', 'post', 'put', 'delete']
+
+SAMPLES = 1000
+
+
+class _Timing(object):
+
+    __slots__ = ('calls', 'total', 'max', 'samples')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+
+
+class Stats(object):
+    """Call counts and timings keyed on name. add() is safe to call from
+    any thread.
+    """
+
+    def __init__(self):
+        self._timings = {}
+        self._lock = threading.Lock()
+        self._rand = random.Random()
+
+    def add(self, name, seconds):
+        """Records a call to name that took seconds."""
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = _Timing()
+            timing.calls += 1
+            timing.total += seconds
+            if seconds > timing.max:
+                timing.max = seconds
+            # keep a fair sample of every call, not just the first
+            if len(timing.samples) < SAMPLES:
+                timing.samples.append(seconds)
+            else:
+                ii = self._rand.randrange(timing.calls)
+                if ii < SAMPLES:
+                    timing.samples[ii] = seconds
+
+    def reset(self):
+        """Throws away everything recorded so far."""
+        with self._lock:
+            self._timings = {}
+
+    def names(self):
+        """Returns the names of everything that has been called."""
+        with self._lock:
+            return sorted(self._timings)
+
+    def get(self, name):
+        """Returns a dictionary with the 'calls', 'total', 'mean', 'max',
+        'p50', 'p90' and 'p99' seconds for name, or None if it hasn't been
+        called.
+        """
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                return None
+            samples = sorted(timing.samples)
+            report = {'calls': timing.calls, 'total': timing.total,
+                      'mean': timing.total / timing.calls,
+                      'max': timing.max}
+        for pp in [50, 90, 99]:
+            report['p%d' % pp] = samples[
+                min(len(samples) - 1, len(samples) * pp // 100)]
+        return report
+
+    def report(self):
+        """Returns a dictionary of what get() says for every name."""
+        return dict((name, self.get(name)) for name in self.names())
+
+    def format(self):
+        """Returns a table of the report, the slowest in total first."""
+        report = self.report()
+        lines = ['%-32s %9s %10s %10s %10s %10s' % (
+            'name', 'calls', 'total s', 'mean ms', 'p90 ms', 'p99 ms')]
+        for name in sorted(report, key=lambda nm: -report[nm]['total']):
+            rr = report[name]
+            lines.append('%-32s %9d %10.3f %10.3f %10.3f %10.3f' % (
+                name, rr['calls'], rr['total'], rr['mean'] * 1000,
+                rr['p90'] * 1000, rr['p99'] * 1000))
+        return '\n'.join(lines)
+
+
+stats = Stats()
+
+# [owner, name, original] for everything enable() swapped
+_swapped = []
+
+
+def _timed(func, name):
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        start = _clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.add(name, _clock() - start)
+    timed.__wrapped__ = func
+    return timed
+
+
+def _timed_convert(func, name):
+    @functools.wraps(func)
+    def timed(val, typ):
+        start = _clock()
+        try:
+            return func(val, typ)
+        finally:
+            stats.add('%s %s' % (name, typ), _clock() - start)
+    timed.__wrapped__ = func
+    return timed
+
+
+def request_name(method, url):
+    """Returns the name a request is recorded under, the method and the
+    kind of record, 'GET computers' for 'computers/id/64/subset/General'.
+    """
+    path = url.split('JSSResource/')[-1].strip('/')
+    return '%s %s' % (method.upper(), path.split('/')[0])
+
+
+def _timed_request(func, method):
+    @functools.wraps(func)
+    def timed(self, *args, **kwargs):
+        start = _clock()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            # the url isn't always first, post takes the class first
+            url = [arg for arg in args if hasattr(arg, 'split')][:1]
+            stats.add(request_name(method, url[0] if url else ''),
+                      _clock() - start)
+    timed.__wrapped__ = func
+    return timed
+
+
+def _swap(owner, name, new):
+    # from __dict__ so a method comes back as it was, None if it was
+    # inherited
+    _swapped.append([owner, name, vars(owner).get(name)])
+    setattr(owner, name, new)
+
+
+def enabled():
+    """Returns True if the instrumentation is switched on."""
+    return bool(_swapped)
+
+
+def enable():
+    """Switches the instrumentation on and returns the Stats that collects
+    what it finds. Calling it again does nothing.
+    """
+    if _swapped:
+        return stats
+    for name in EXTRACTORS + WRITERS:
+        _swap(tools, name, _timed(getattr(tools, name), name))
+    for name in ['Convert', 'Convert_back']:
+        _swap(tools, name, _timed_convert(getattr(tools, name), name))
+    for method in _requests:
+        if hasattr(jss.JSS, method):
+            _swap(jss.JSS, method,
+                  _timed_request(getattr(jss.JSS, method), method))
+    if jss_async is not None:
+        # _send, what request does once it has a slot, the wait for one
+        # is our limit not the JSS
+        _swap(jss_async.AsyncJSS, '_send', jss_async._timed(
+            jss_async.AsyncJSS._send,
+            lambda method, path, seconds: stats.add(
+                request_name(method, path), seconds)))
+    return stats
+
+
+def disable():
+    """Switches the instrumentation off, what was collected is kept."""
+    while _swapped:
+        owner, name, original = _swapped.pop()
+        if original is None:
+            delattr(owner, name)
+        else:
+            setattr(owner, name, original)
@@ -0,0 +1,362 @@
+#
+# jss_table.py
+#
+# hold the c_info (or m_info) of a whole fleet as columns rather than
+# thousands of dictionaries.
+#
+"""A columnar table of fleet info.
+
+Twenty thousand c_info dictionaries take hundreds of megabytes and every
+question about them is a python loop. FleetTable keeps the same data as
+numpy columns: booleans and integers as typed arrays, dates as datetime64
+and strings dictionary encoded (an array of small integer codes plus the
+list of distinct values) so a column of 20,000 model names holds a few
+dozen strings. The columns are built as the records arrive so you never
+need them all at once, hand it a generator.
+
+    table = FleetTable(c_info(computer) for computer in computers)
+    old = table.filter(table['last'] < numpy.datetime64('2018-01-01'))
+    print old.count_by('building')
+    for info in old.filter(old.equal('os', '10.12.6')).to_dicts():
+        ...
+
+You will need numpy.
+"""
+
+import array
+import datetime
+import sys
+
+import numpy
+from dateutil import tz
+
+# what a missing bool or string is stored as
+_NONE = -1
+
+# and a missing int or date when we need them as codes
+_MISSING = numpy.iinfo(numpy.int64).min
+
+
+try:
+    _strings = basestring
+except NameError:
+    _strings = str
+
+# the kinds of column that are dictionary encoded
+_encoded = ('str', 'object')
+
+
+def _kind(val):
+    """Works out what sort of column a value needs."""
+    if isinstance(val, bool):
+        return 'bool'
+    if isinstance(val, int):
+        return 'int'
+    if isinstance(val, datetime.datetime):
+        return 'date'
+    if isinstance(val, _strings):
+        return 'str'
+    return 'object'
+
+
+def _naive(val):
+    """datetime64 has no time zones so we keep everything in UTC."""
+    if val.tzinfo is not None:
+        val = val.astimezone(tz.tzutc()).replace(tzinfo=None)
+    return val
+
+
+class _Builder(object):
+    """Collects one column a value at a time. Strings are dictionary
+    encoded as they arrive so all that is kept for each row is a small
+    code. A column that holds more than one sort of value becomes an
+    'object' column, encoded the same way.
+    """
+
+    def __init__(self, rows=0):
+        # rows so far, all None until we see a value
+        self.rows = rows
+        self.kind = None
+        self.raw = None
+        self.index = None
+        self.values = None
+        self.codes = None
+
+    def append(self, val):
+        if val is not None:
+            kind = _kind(val)
+            if kind != self.kind and self.kind != 'object':
+                self._change(kind)
+        if self.codes is not None:
+            self._encode(val)
+        elif self.raw is not None:
+            self.raw.append(val)
+        self.rows += 1
+
+    def _key(self, val):
+        # 1 and True are equal, keep them apart when they can both turn up
+        if self.kind == 'object':
+            return val.__class__, val
+        return val
+
+    def _encode(self, val):
+        if val is None:
+            self.codes.append(_NONE)
+            return
+        key = self._key(val)
+        code = self.index.get(key)
+        if code is None:
+            code = self.index[key] = len(self.values)
+            self.values.append(val)
+        self.codes.append(code)
+
+    def _change(self, kind):
+        if self.kind is None:
+            self.kind = kind
+            if kind in _encoded:
+                self.index = {}
+                self.values = []
+                self.codes = array.array('i', [_NONE]) * self.rows
+            else:
+                self.raw = [None] * self.rows
+            return
+        # a second sort of value
+        old = self.kind
+        self.kind = 'object'
+        if old == 'str':
+            self.index = dict((self._key(val), code)
+                              for code, val in enumerate(self.values))
+            return
+        self.index = {}
+        self.values = []
+        self.codes = array.array('i')
+        for val in self.raw:
+            self._encode(val)
+        self.raw = None
+
+    def column(self):
+        """Returns the finished _Column."""
+        column = _Column.__new__(_Column)
+        column.kind = self.kind or 'str'
+        column.values = None
+        column.missing = None
+        raw = self.raw
+        if self.kind == 'bool':
+            column.data = numpy.array(
+                [_NONE if val is None else val for val in raw],
+                dtype=numpy.int8)
+        elif self.kind == 'int':
+            column.missing = numpy.array([val is None for val in raw],
+                                         dtype=bool)
+            column.data = numpy.array(
+                [0 if val is None else val for val in raw],
+                dtype=numpy.int64)
+        elif self.kind == 'date':
+            column.data = numpy.array(
+                [numpy.datetime64('NaT') if val is None
+                 else numpy.datetime64(_naive(val), 'us') for val in raw],
+                dtype='datetime64[us]')
+        elif self.kind is None:
+            column.values = []
+            column.data = numpy.full(self.rows, _NONE, dtype=numpy.int32)
+        else:
+            column.values = self.values
+            column.data = numpy.frombuffer(self.codes, dtype=numpy.intc)
+        return column
+
+
+class _Column(object):
+    """One column. data is the numpy array, for 'str' and 'object' columns
+    values holds the distinct values and data the index of each into
+    values, with -1 for None. Missing ints are flagged in missing.
+    """
+
+    def take(self, rows):
+        """Returns a new column holding just rows."""
+        column = _Column.__new__(_Column)
+        column.kind = self.kind
+        column.values = self.values
+        column.data = self.data[rows]
+        column.missing = None if self.missing is None else self.missing[rows]
+        return column
+
+    def codes(self):
+        """Returns integers that are equal where the values are, for
+        grouping. decode turns one back into a value.
+        """
+        if self.kind == 'int':
+            return numpy.where(self.missing, _MISSING, self.data)
+        if self.kind == 'date':
+            # NaT is already the smallest int64
+            return self.data.astype(numpy.int64)
+        return self.data
+
+    def decode(self, code):
+        if self.kind in ('int', 'date'):
+            if code == _MISSING:
+                return None
+            if self.kind == 'date':
+                return numpy.datetime64(code, 'us').astype(datetime.datetime)
+            return code
+        if code == _NONE:
+            return None
+        if self.kind in _encoded:
+            return self.values[code]
+        return bool(code)
+
+    def array(self):
+        """The column as you would want to compare it, see FleetTable."""
+        if self.kind in _encoded:
+            return numpy.array(self.values + [None], dtype=object)[self.data]
+        if self.kind == 'bool':
+            return self.data == 1
+        return self.data
+
+    def value(self, row):
+        if self.kind == 'int':
+            return None if self.missing[row] else int(self.data[row])
+        if self.kind == 'date':
+            return self.decode(int(self.data[row].astype(numpy.int64)))
+        return self.decode(int(self.data[row]))
+
+
+class FleetTable(object):
+    """The c_info (or m_info) dictionaries of a fleet held as columns. Build
+    one from any iterable of dictionaries that share their keys.
+
+    table[key] gives a whole column as a numpy array to compare against,
+    booleans as a bool array (missing is False), ints as int64, dates as
+    datetime64 (missing is NaT) and strings as an object array. A
+    comparison gives you a mask to hand to filter(). A column holding more
+    than one sort of value is an object array too.
+
+    The records are read once, one at a time, and each goes into the
+    columns as it arrives.
+    """
+
+    def __init__(self, records=()):
+        builders = {}
+        keys = []
+        count = 0
+        for record in records:
+            for key in record:
+                builder = builders.get(key)
+                if builder is None:
+                    builder = builders[key] = _Builder(count)
+                    keys.append(key)
+                builder.append(record[key])
+            count += 1
+            if len(record) < len(builders):
+                # the keys this one doesn't have
+                for builder in builders.values():
+                    if builder.rows < count:
+                        builder.append(None)
+        self._count = count
+        self.keys = keys
+        self._columns = {}
+        for key in keys:
+            self._columns[key] = builders.pop(key).column()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, key):
+        return self._columns[key].array()
+
+    def kind(self, key):
+        """Returns what a column holds, one of 'bool', 'int', 'date',
+        'str' or 'object' if it holds more than one sort of value.
+        """
+        return self._columns[key].kind
+
+    @property
+    def nbytes(self):
+        """Roughly how much memory the columns take."""
+        total = 0
+        for column in self._columns.values():
+            total += column.data.nbytes
+            if column.missing is not None:
+                total += column.missing.nbytes
+            if column.values is not None:
+                total += sum(len(val) if isinstance(val, _strings)
+                             else sys.getsizeof(val) for val in column.values)
+        return total
+
+    def equal(self, key, value):
+        """Returns a mask of the rows where key is value. For strings this
+        compares the codes rather than the strings themselves.
+        """
+        column = self._columns[key]
+        if column.kind in _encoded:
+            if value not in column.values:
+                return numpy.zeros(self._count, dtype=bool)
+            return column.data == column.values.index(value)
+        if value is None:
+            if column.kind == 'int':
+                return column.missing.copy()
+            if column.kind == 'date':
+                return numpy.isnat(column.data)
+            return column.data == _NONE
+        if column.kind == 'bool':
+            return column.data == int(value)
+        if column.kind == 'date':
+            return column.data == numpy.datetime64(_naive(value), 'us')
+        return (column.data == value) & ~column.missing
+
+    def isin(self, key, values):
+        """Returns a mask of the rows where key is one of values."""
+        mask = numpy.zeros(self._count, dtype=bool)
+        for value in values:
+            mask |= self.equal(key, value)
+        return mask
+
+    def filter(self, mask):
+        """Returns a new FleetTable with just the rows in mask, which can
+        be a boolean mask or an array of row numbers.
+        """
+        table = FleetTable.__new__(FleetTable)
+        rows = numpy.asarray(mask)
+        if rows.dtype == bool:
+            rows = numpy.flatnonzero(rows)
+        table._count = len(rows)
+        table.keys = self.keys
+        table._columns = dict((key, column.take(rows))
+                              for key, column in self._columns.items())
+        return table
+
+    def count_by(self, *keys):
+        """Returns a dictionary of how many rows have each value of key,
+        e.g. count_by('model'). Given more than one key the dictionary is
+        keyed on tuples of their values, e.g. count_by('model', 'os').
+        """
+        columns = [self._columns[key] for key in keys]
+        if not self._count:
+            return {}
+        if len(columns) == 1 and columns[0].kind in _encoded + ('bool',):
+            # codes start at -1 for None so shift them up one to count
+            column = columns[0]
+            counts = numpy.bincount(column.data.astype(numpy.int64) + 1)
+            return dict((column.decode(code - 1), int(count))
+                        for code, count in enumerate(counts) if count)
+        codes = numpy.vstack([column.codes() for column in columns])
+        found, counts = numpy.unique(codes, axis=1, return_counts=True)
+        by = {}
+        for ii in range(found.shape[1]):
+            key = tuple(column.decode(int(code))
+                        for column, code in zip(columns, found[:, ii]))
+            by[key if len(keys) > 1 else key[0]] = int(counts[ii])
+        return by
+
+    def to_dicts(self, keys=None):
+        """Returns the rows as an array of dictionaries like the ones the
+        table was built from, or with just the keys asked for. Dates come
+        back in UTC without a time zone.
+        """
+        keys = keys or self.keys
+        ar = []
+        for row in range(self._count):
+            dict = {}
+            for key in keys:
+                dict[key] = self._columns[key].value(row)
+            ar.append(dict)
+        return ar
@@ -41,13 +41,83 @@ __date__ = '21 June 2018'
 import jss
 import getpass
 from dateutil import parser
+from dateutil import tz
 import datetime
+import re
 import time
+import collections
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 import copy
+import io
+import threading
 from xml.etree import ElementTree
 
 
 # some low level useful routines
+
+# the JSS only ever gives us dates as '2017-12-06', '2017-12-06 17:32:50' or
+# '2017-12-06T17:32:50.105+1000' so we parse those ourselves and only hand
+# anything else to dateutil.
+_jss_date_re = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)'
+    r'(?:[T ](\d\d):(\d\d):(\d\d)(?:\.(\d{1,6}))?'
+    r'(Z|[+-]\d\d:?\d\d)?)?$')
+
+
+def _parse_date(val):
+    """Parses the fixed date formats used by the JSS into the same datetime
+    dateutil would give us, falling back to dateutil for anything else.
+    """
+    mm = _jss_date_re.match(val) if val else None
+    if not mm:
+        return parser.parse(val)
+    yr, mo, dy, hh, mi, ss, frac, zone = mm.groups()
+    try:
+        dt = datetime.datetime(
+            int(yr), int(mo), int(dy), int(hh or 0), int(mi or 0),
+            int(ss or 0), int(frac.ljust(6, '0')) if frac else 0)
+    except ValueError:
+        return parser.parse(val)
+    if zone:
+        if zone == 'Z':
+            offset = 0
+        else:
+            offset = (int(zone[1:3]) * 60 + int(zone[-2:])) * 60
+            if zone[0] == '-':
+                offset = -offset
+        dt = dt.replace(
+            tzinfo=tz.tzutc() if offset == 0 else tz.tzoffset(None, offset))
+    return dt
+
+
+_convert = {
+    'BOOL': lambda x: x.lower() == 'true',
+    'INTN': lambda x: int(x),
+    'DATE': _parse_date,
+    'DUTC': _parse_date,
+    'EPOK': lambda x: datetime.datetime.fromtimestamp(int(x)/1000),
+    'TIME': _parse_date,
+    'STRG': lambda x: x,
+    'EBOL': lambda x: x == 'True',
+    'ENBL': lambda x: x == '1',
+}
+
+_convert_back = {
+    'BOOL': lambda x: str(x).lower(),
+    'INTN': lambda x: str(x),
+    'DATE': lambda x: str(x),
+    'DUTC': lambda x: x.strftime("%Y-%m-%H:%M:S.%fT%X%z"),
+    'EPOK': lambda x: str(int((time.mktime(x.timetuple()) * 1000))),
+    'TIME': lambda x: str(x),
+    'STRG': lambda x: x,
+    'EBOL': lambda x: str(x),
+    'ENBL': lambda x: '1' if x else '0'
+}
+
+
 def Convert(val, typ):
     """Takes a string value from JSS converts it type 'typ''.
     `typ` is one of:
@@ -64,41 +134,22 @@ def Convert(val, typ):
 
     The date routines and TIME return a datetime object.
 
-    NOTE: The conversions DATE, DUTC and TIME use the parser routine from
-    dateutils so they can accept a wide variety of formats, not just the one
+    NOTE: The conversions DATE, DUTC and TIME parse the formats the JSS uses
+    directly and fall back to the parser routine from dateutils for anything
+    else so they can accept a wide variety of formats, not just the one
     used in the JSS so you may find it easier to run convert on such as
     '10 Dec 2017 10:30AM' rather than build your own datetime object for
     comparison purposes. That's one reason for exposing it.
     """
-    return {
-        'BOOL': lambda x: x.lower() == 'true',
-        'INTN': lambda x: int(x),
-        'DATE': lambda x: parser.parse(x),
-        'DUTC': lambda x: parser.parse(x),
-        'EPOK': lambda x: datetime.datetime.fromtimestamp(int(x)/1000),
-        'TIME': lambda x: parser.parse(x),
-        'STRG': lambda x: x,
-        'EBOL': lambda x: x == 'True',
-        'ENBL': lambda x: x == '1',
-    }[typ](val)
+    return _convert[typ](val)
 
 
 def Convert_back(val, typ):
     """The reverse of convert. Takes a python variable and converts it to a
     string ready for the JSS.
     """
-    if val:
-        return {
-            'BOOL': lambda x: str(x).lower(),
-            'INTN': lambda x: str(x),
-            'DATE': lambda x: str(x),
-            'DUTC': lambda x: x.strftime("%Y-%m-%H:%M:S.%fT%X%z"),
-            'EPOK': lambda x: str(int((time.mktime(x.timetuple()) * 1000))),
-            'TIME': lambda x: str(x),
-            'STRG': lambda x: x,
-            'EBOL': lambda x: str(x),
-            'ENBL': lambda x: '1' if x else '0'
-        }[typ](val)
+    if val is not None and val != '':
+        return _convert_back[typ](val)
     else:
         return val
 
@@ -132,6 +183,364 @@ def Jopen(pref=None, pword=None):
     return jss.JSS(jss_prefs)
 
 
+# Key tables are compiled once at import into an extraction plan. The plan is
+# a tree of tag -> [key indexes, sub plan] so that a record can be filled in a
+# single walk over the subtrees we need rather than a findtext from the root
+# for every key. If you change a key table at run time recompile its plan.
+def _compile_keys(keys):
+    """Compiles a key table of [path, name] pairs into an extraction plan
+    for _extract.
+    """
+    tree = {}
+    for ii, key in enumerate(keys):
+        node = [None, tree]
+        for tag in key[0].split('/'):
+            node = node[1].setdefault(tag, [[], {}])
+        node[0].append(ii)
+    return [key[1] for key in keys], tree
+
+
+def _walk(elem, tree, vals):
+    for child in elem:
+        node = tree.get(child.tag)
+        if node is None:
+            continue
+        for ii in node[0]:
+            # first match wins, the same as findtext
+            if vals[ii] is None:
+                vals[ii] = child.text or ''
+        if node[1]:
+            _walk(child, node[1], vals)
+
+
+def _extract(record, plan):
+    """Returns a dictionary filled from record using a compiled plan. It gives
+    exactly what a findtext per key would, including None for anything missing.
+    """
+    names, tree = plan
+    vals = [None] * len(names)
+    _walk(record, tree, vals)
+    # where a name appears twice in a key table the later key wins
+    return dict(zip(names, vals))
+
+
+def _changed(info, current, keys, our_info):
+    """Returns [path, text] for every key whose value in info differs from
+    what was extracted from the record, text ready for the JSS.
+    """
+    ar = []
+    for key in keys:
+        if info[key[1]] != current[key[1]]:
+            ar.append([key[0], our_info[key[1]]])
+    return ar
+
+
+# while an EditSession is open in a thread the write routines hand their
+# saves to it rather than going to the JSS
+_session = threading.local()
+
+
+def _save(record):
+    session = getattr(_session, 'current', None)
+    if session is None:
+        record.save()
+    else:
+        session._add(record, None)
+
+
+def _send(record, root):
+    session = getattr(_session, 'current', None)
+    if session is None:
+        record.jss.put(record.url.split('/subset/')[0], root)
+    else:
+        session._add(record, root)
+
+
+def _merge(root, update):
+    """Merges a record of changes into another the way the JSS would."""
+    for child in update:
+        if child.tag == 'extension_attribute':
+            match = None
+            for attr in root.findall('extension_attribute'):
+                if attr.findtext('name') == child.findtext('name'):
+                    match = attr
+        else:
+            match = root.find(child.tag)
+        if match is None:
+            root.append(child)
+        elif len(child):
+            _merge(match, child)
+        else:
+            match.text = child.text
+
+
+def _put(record, changes):
+    """Sets each [path, text] in changes on the record and sends the JSS a
+    record with just those elements in it. Sends nothing if there are no
+    changes. Returns True if it sent anything.
+    """
+    if not changes:
+        return False
+    root = ElementTree.Element(record.tag)
+    for path, text in changes:
+        node = record.find(path)
+        if node is not None:
+            node.text = text
+        node = root
+        for tag in path.split('/'):
+            child = node.find(tag)
+            if child is None:
+                child = ElementTree.SubElement(node, tag)
+            node = child
+        node.text = text
+    _send(record, root)
+    return True
+
+
+def _put_attributes(record, attribs, current):
+    """Sends the JSS just the extension attributes whose value in attribs
+    differs from current. Returns True if it sent anything.
+    """
+    root = ElementTree.Element(record.tag)
+    eas = ElementTree.SubElement(root, 'extension_attributes')
+    for attr in record.findall('extension_attributes/extension_attribute'):
+        nm = attr.findtext('name')
+        if nm not in attribs or attribs[nm]['value'] == current[nm]['value']:
+            continue
+        new_val = Convert_back(attribs[nm]['value'], attribs[nm]['type'])
+        attr.find('value').text = new_val
+        ea = ElementTree.SubElement(eas, 'extension_attribute')
+        ElementTree.SubElement(ea, 'id').text = attr.findtext('id')
+        ElementTree.SubElement(ea, 'name').text = nm
+        ElementTree.SubElement(ea, 'value').text = new_val
+    if not len(eas):
+        return False
+    _send(record, root)
+    return True
+
+
+class EditSession(object):
+    """Collects the saves from c_info_write, c_attributes_write, c_remote,
+    m_info_write and m_attributes_write made inside a with block and sends
+    them as a single request for each record when the block ends.
+
+        with EditSession() as edit:
+            c_remote(computer, 'jamf', 'secret')
+            c_info_write(info, computer)
+        print edit.avoided
+
+    If the block raises nothing is sent, the records keep the changes.
+    writes counts the saves asked for, saves the requests sent and avoided
+    is the difference.
+    """
+
+    def __init__(self):
+        self.writes = 0
+        self.saves = 0
+        self._pending = collections.OrderedDict()
+        self._outer = None
+
+    @property
+    def avoided(self):
+        return self.writes - self.saves
+
+    def _add(self, record, root):
+        # root is None when the whole record is to be saved, the record
+        # itself always holds every change so that covers the rest
+        self.writes += 1
+        pending = self._pending.get(id(record))
+        if pending is None:
+            self._pending[id(record)] = [record, root]
+        elif pending[1] is None or root is None:
+            pending[1] = None
+        else:
+            _merge(pending[1], root)
+
+    def flush(self):
+        """Sends everything collected so far."""
+        for record, root in self._pending.values():
+            if root is None:
+                record.save()
+            else:
+                record.jss.put(record.url.split('/subset/')[0], root)
+            self.saves += 1
+        self._pending.clear()
+
+    def __enter__(self):
+        self._outer = getattr(_session, 'current', None)
+        _session.current = self
+        return self
+
+    def __exit__(self, typ, val, tb):
+        _session.current = self._outer
+        if typ is None:
+            self.flush()
+
+
+def _sections(keys):
+    """Returns the top level sections of a record a key table reads."""
+    ar = []
+    for key in keys:
+        tag = key[0].split('/')[0]
+        if tag not in ar:
+            ar.append(tag)
+    return ar
+
+
+def _subset(sections, extractors):
+    """Returns the subset to ask the JSS for so a record has everything the
+    extractors need, or None if we don't know what one of them needs.
+    """
+    ar = []
+    for func in extractors:
+        # jss_stats wraps the routines while it is timing them
+        func = getattr(func, '__wrapped__', func)
+        if func not in sections:
+            return None
+        for tag in sections[func]:
+            # the JSS doesn't care about case but it does about underscores
+            name = tag.replace('_', '')
+            if name not in ar:
+                ar.append(name)
+    return ar
+
+
+# Record classes. A fleet's worth of dictionaries is mostly dictionary
+# overhead so each extractor can hand back an object with __slots__ instead,
+# pass it slots=True. The classes are built from the key tables.
+class _Record(object):
+    """The base of the record classes. Read a field as record.os or
+    record['os'], to_dict() gives you the dictionary back.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, dict):
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(record, name, dict.get(name))
+        return record
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def __setitem__(self, name, val):
+        setattr(self, name, val)
+
+    def __contains__(self, name):
+        return name in self.__slots__
+
+    def __eq__(self, other):
+        return (type(self) is type(other)
+                and self.to_dict() == other.to_dict())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __getstate__(self):
+        # not to_dict(), a Policy's paks and scripts stay records
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name in self.__slots__:
+            setattr(self, name, state.get(name))
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.to_dict())
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def to_dict(self):
+        """Returns the dictionary the extractor would have without slots."""
+        dict = {}
+        for name in self.__slots__:
+            val = getattr(self, name)
+            if isinstance(val, list):
+                val = [item.to_dict() if isinstance(item, _Record) else item
+                       for item in val]
+            dict[name] = val
+        return dict
+
+
+def _record_class(name, keys, convert_keys=(), extra=()):
+    """Builds a record class with a slot for every name in a key table (of
+    names or [path, name] pairs), its convert table, as that can add keys
+    of its own, and extra.
+    """
+    names = []
+    for nm in ([key if isinstance(key, str) else key[1] for key in keys] +
+               [key[0] for key in convert_keys] + list(extra)):
+        # a name can appear more than once but gets one slot
+        if nm not in names:
+            names.append(nm)
+    return type(name, (_Record,), {'__slots__': tuple(names)})
+
+
+class LazyInfo(Mapping):
+    """What c_info and m_info return with lazy=True. It reads like their
+    dictionary but a key is only found in the record and converted the first
+    time you ask for it, after that it is remembered. Most jobs only want a
+    few keys out of dozens so this saves converting the rest.
+
+    You can set keys, which stay set, and to_dict() gives you the whole
+    dictionary. It holds on to the record so don't keep thousands of them.
+    """
+
+    __slots__ = ('_record', '_paths', '_types', '_values')
+
+    def __init__(self, record, paths, types):
+        self._record = record
+        self._paths = paths
+        self._types = types
+        self._values = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        val = self._record.findtext(self._paths[key])
+        if key in self._types:
+            val = Convert(val, self._types[key])
+        self._values[key] = val
+        return val
+
+    def __setitem__(self, key, val):
+        self._values[key] = val
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __repr__(self):
+        return 'LazyInfo(%r)' % self._values
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.to_dict(), memo)
+
+    def to_dict(self):
+        """Returns the whole dictionary, converting whatever is left."""
+        return dict((key, self[key]) for key in self._paths)
+
+
+def _lazy_keys(keys, convert_keys):
+    """Turns a key table and its convert table into the lookups LazyInfo
+    needs. Where a name appears twice the later key wins, like _extract.
+    """
+    return (dict((key[1], key[0]) for key in keys),
+            dict((key[0], key[1]) for key in convert_keys))
+
+
 # Routines for the computer record
 
 _c_info_keys = [
@@ -180,6 +589,8 @@ _c_info_keys = [
     ['configuration_profiles/size', 'profiles_count']
 ]
 
+_c_info_plan = _compile_keys(_c_info_keys)
+
 _c_info_convert_keys = [
     ['initial', 'DATE'],
     ['last', 'TIME'],
@@ -189,28 +600,43 @@ _c_info_convert_keys = [
     ['profiles_count', 'INTN']
 ]
 
+CInfo = _record_class('CInfo', _c_info_keys, _c_info_convert_keys)
+
+_c_info_lazy = _lazy_keys(_c_info_keys, _c_info_convert_keys)
+
 
-def c_info(computer):
+def c_info(computer, slots=False, lazy=False):
     """Returns a a dictionary of general information about the computer.
+    Pass slots=True for a CInfo instead, or lazy=True for a LazyInfo that
+    only converts the keys you read.
     """
-    dict = {}
-    for key in _c_info_keys:
-        dict.update({key[1]: computer.findtext(key[0])})
+    if lazy:
+        return LazyInfo(computer, *_c_info_lazy)
+    dict = _extract(computer, _c_info_plan)
     for cc in _c_info_convert_keys:
         dict[cc[0]] = Convert(dict[cc[0]], cc[1])
+    if slots:
+        return CInfo.from_dict(dict)
     return dict
 
 
-def c_info_write(info, computer):
+def c_info_write(info, computer, minimal=False):
     """Writes out any changed computer info. Pass it the info
     dictionary with changed info and the object returned from jss.Computer()
+    Pass minimal=True to send the JSS only the fields that differ from what
+    c_info reads from computer, and nothing at all if none do. Returns True
+    if anything was sent.
     """
     our_info = copy.deepcopy(info)
     for key in _c_info_convert_keys:
         our_info[key[0]] = Convert_back(our_info[key[0]], key[1])
+    if minimal:
+        return _put(computer, _changed(
+            info, c_info(computer), _c_info_keys, our_info))
     for key in _c_info_keys:
         computer.find(key[0]).text = our_info[key[1]]
-    computer.save()
+    _save(computer)
+    return True
 
 
 # apps to ignore in app list (Apple apps)
@@ -277,6 +703,10 @@ _c_apps_ignore = [
     # 'Skype for Business',
 ]
 
+# the set c_apps checks against when it isn't given one, built once here
+# rather than on every call
+_c_apps_ignore_set = frozenset(_c_apps_ignore)
+
 
 def c_apps(computer, ignore=None):
     """Returns a dictionary of the apps installed. Key is name and value is
@@ -285,8 +715,8 @@ def c_apps(computer, ignore=None):
     removeds the `.app` at the end of the file name since  an app has it
     but people don't usually see it :)
     """
-    if not ignore:
-        ignore = _c_apps_ignore
+    # a set so each app is one lookup rather than a scan of the list
+    ignore = frozenset(ignore) if ignore else _c_apps_ignore_set
     dict = {}
     for app in computer.findall('software/applications/application'):
         nm = app.findtext('name').split('.')[0]
@@ -311,29 +741,39 @@ def c_attributes(computer):
     # the boolean etension attributes doesn't spring to mind.
     dict = {}
     for attr in computer.findall('extension_attributes/extension_attribute'):
-        nm = attr.findtext('name')
-        ty = attr.findtext('type')
-        val = attr.findtext('value')
-        typ = _c_attr_types[ty]
-        if typ == 'STRG' and val in ['True', 'False']:
-            typ = 'EBOL'
-        if typ == 'STRG' and val in ['0', '1']:
-            typ = 'ENBL'
-        dict.update({nm: {'value': Convert(val, typ), 'type': typ}})
+        dict.update(_c_attribute(attr))
     return dict
 
 
-def c_attributes_write(attribs, computer):
+def _c_attribute(attr):
+    nm = attr.findtext('name')
+    ty = attr.findtext('type')
+    val = attr.findtext('value')
+    typ = _c_attr_types[ty]
+    if typ == 'STRG' and val in ['True', 'False']:
+        typ = 'EBOL'
+    if typ == 'STRG' and val in ['0', '1']:
+        typ = 'ENBL'
+    return {nm: {'value': Convert(val, typ), 'type': typ}}
+
+
+def c_attributes_write(attribs, computer, minimal=False):
     """Writes out any changed extension attributes. Pass it the attribute
     dictionary with changed attributes and object returned from jss.Computer()
+    Pass minimal=True to send the JSS only the attributes that differ from
+    what c_attributes reads from computer, and nothing at all if none do.
+    Returns True if anything was sent.
     """
+    if minimal:
+        return _put_attributes(computer, attribs, c_attributes(computer))
     for attr in computer.findall('extension_attributes/extension_attribute'):
         nm = attr.findtext('name')
         val = attr.findtext('value')
         if attribs[nm]['value'] != val:
             new_val = Convert_back(attribs[nm]['value'], attribs[nm]['type'])
             attr.find('value').text = new_val
-    computer.save()
+    _save(computer)
+    return True
 
 
 def c_groups(computer):
@@ -357,7 +797,7 @@ def c_remote(computer, nm, pword):
         add.text = pword
         computer.find('general/remote_management/managed').text = 'true'
         computer.find('general/remote_management/management_username').text = nm
-        computer.save()
+        _save(computer)
     else:
         computer.find('general/remote_management/managed').text = 'false'
         computer.find('general/remote_management/management_username').text = ""
@@ -379,10 +819,13 @@ _c_user_convert_keys = [
     ['file_vault_enabled', 'BOOL'],
 ]
 
+CUser = _record_class('CUser', _c_user_keys, _c_user_convert_keys)
+
 
-def c_users(computer):
+def c_users(computer, slots=False):
     """Returns an array containing a dictionary for each user on the
-    computer. It ignores those whose name begins with '_'.
+    computer. It ignores those whose name begins with '_'. Pass slots=True
+    for an array of CUser.
     """
     ar = []
     for u in computer.find('groups_accounts/local_accounts'):
@@ -392,7 +835,7 @@ def c_users(computer):
                 dict.update({key: u.findtext(key)})
             for cc in _c_user_convert_keys:
                 dict[cc[0]] = Convert(dict[cc[0]], cc[1])
-            ar.append(dict)
+            ar.append(CUser.from_dict(dict) if slots else dict)
     return ar
 
 
@@ -409,22 +852,30 @@ _c_certificates_convert_keys = [
     ['epoch', 'EPOK'],
 ]
 
+CCertificate = _record_class('CCertificate', _c_certificates_keys,
+                             _c_certificates_convert_keys)
 
-def c_certificates(computer):
+
+def c_certificates(computer, slots=False):
     """Returns an array containing a dictionary for each certificate on
-    the computer.
+    the computer. Pass slots=True for an array of CCertificate.
     """
     ar = []
     for cert in computer.findall('certificates/certificate'):
-        dict = {}
-        for key in _c_certificates_keys:
-            dict.update({key[1]: cert.findtext(key[0])})
-        for cc in _c_certificates_convert_keys:
-            dict[cc[0]] = Convert(dict[cc[0]], cc[1])
-        ar.append(dict)
+        dict = _c_certificate(cert)
+        ar.append(CCertificate.from_dict(dict) if slots else dict)
     return ar
 
 
+def _c_certificate(cert):
+    dict = {}
+    for key in _c_certificates_keys:
+        dict.update({key[1]: cert.findtext(key[0])})
+    for cc in _c_certificates_convert_keys:
+        dict[cc[0]] = Convert(dict[cc[0]], cc[1])
+    return dict
+
+
 _c_profiles_keys = [
     'id',
     'name',
@@ -436,10 +887,13 @@ _c_profiles_convert_keys = [
     ['is_removable', 'BOOL'],
 ]
 
+CProfile = _record_class('CProfile', _c_profiles_keys,
+                         _c_profiles_convert_keys)
+
 
-def c_profiles(computer):
+def c_profiles(computer, slots=False):
     """Returns an array containing a dictionary for each configuration
-    profile on the computer.
+    profile on the computer. Pass slots=True for an array of CProfile.
     """
     ar = []
     for profile in computer.findall(
@@ -449,10 +903,98 @@ def c_profiles(computer):
             dict.update({key: profile.findtext(key)})
         for cc in _c_profiles_convert_keys:
             dict[cc[0]] = Convert(dict[cc[0]], cc[1])
-        ar.append(dict)
+        ar.append(CProfile.from_dict(dict) if slots else dict)
     return ar
 
 
+def c_iterparse(source, ignore=None):
+    """Reads a computer record from raw XML bytes (or a file like object)
+    a piece at a time, yielding what it finds as it goes and throwing each
+    element away once it is used so memory stays flat however much software
+    the computer has. It yields (key, value) pairs:
+    ('apps', {name: version}) for each app not ignored,
+    ('attributes', {name: {'value': .., 'type': ..}}) for each extension
+    attribute, ('certificates', dict) for each certificate, and last of all
+    ('info', dict) with what c_info would give you.
+    """
+    ignore = frozenset(ignore) if ignore else _c_apps_ignore_set
+    if not hasattr(source, 'read'):
+        source = io.BytesIO(source)
+    names, tree = _c_info_plan
+    vals = [None] * len(names)
+    path = []
+    for event, elem in ElementTree.iterparse(source, ('start', 'end')):
+        if event == 'start':
+            path.append(elem)
+            continue
+        path.pop()
+        depth = len(path)
+        if depth == 0:
+            break
+        if depth == 1:
+            # c_info sections are small, we keep them until they are done
+            if elem.tag in tree:
+                _walk((elem,), tree, vals)
+        elif path[1].tag in tree:
+            continue
+        elif depth == 2:
+            if elem.tag == 'extension_attribute':
+                yield 'attributes', _c_attribute(elem)
+            elif elem.tag == 'certificate':
+                yield 'certificates', _c_certificate(elem)
+        elif depth == 3 and path[1].tag == 'software':
+            # applications, receipts, fonts and the like
+            if elem.tag == 'application':
+                nm = elem.findtext('name').split('.')[0]
+                if nm not in ignore:
+                    yield 'apps', {nm: elem.findtext('version')}
+        else:
+            continue
+        path[-1].remove(elem)
+    info = dict(zip(names, vals))
+    for cc in _c_info_convert_keys:
+        info[cc[0]] = Convert(info[cc[0]], cc[1])
+    yield 'info', info
+
+
+def c_stream(source, ignore=None):
+    """Returns a dictionary with the keys 'info', 'apps', 'attributes' and
+    'certificates' holding what c_info, c_apps, c_attributes and
+    c_certificates would return, read from the raw XML of a computer record
+    with c_iterparse so the whole record is never held in memory.
+    """
+    dict = {'info': None, 'apps': {}, 'attributes': {}, 'certificates': []}
+    for key, val in c_iterparse(source, ignore):
+        if key == 'certificates':
+            dict[key].append(val)
+        elif key == 'info':
+            dict[key] = val
+        else:
+            dict[key].update(val)
+    return dict
+
+
+# the sections of a computer record each routine reads
+_c_sections = {
+    c_info: _sections(_c_info_keys),
+    c_apps: ['software'],
+    c_attributes: ['extension_attributes'],
+    c_groups: ['groups_accounts'],
+    c_users: ['groups_accounts'],
+    c_certificates: ['certificates'],
+    c_profiles: ['configuration_profiles'],
+}
+
+
+def c_subset(extractors):
+    """Returns the subset of the computer record the functions in
+    extractors need, ready to hand to jss.Computer(id, subset=...), so you
+    don't fetch a whole record to read a few sections of it. Returns None
+    if one of them isn't a routine from here.
+    """
+    return _subset(_c_sections, extractors)
+
+
 # Other record types
 
 _packages_keys = [
@@ -479,23 +1021,28 @@ _packages_keys = [
 
 _packages_convert_keys = [
     ['reboot', 'BOOL'],
-    ['fill_user', 'BOOL'],
-    ['fill', 'BOOL'],
+    ['fut', 'BOOL'],
+    ['feu', 'BOOL'],
     ['boot_req', 'BOOL'],
-    ['allow_uninst', 'BOOL'],
+    ['uninstall', 'BOOL'],
     ['install_if_avail', 'BOOL'],
     ['send_not', 'BOOL'],
 ]
 
+Package = _record_class('Package', _packages_keys, _packages_convert_keys)
+
 
-def package(package):
-    """Returns a dictionary of info about a package.
+def package(package, slots=False):
+    """Returns a dictionary of info about a package. Pass slots=True for a
+    Package instead.
     """
     dict = {}
     for key in _packages_keys:
         dict.update({key[1]: package.findtext(key[0])})
     for cc in _packages_convert_keys:
         dict[cc[0]] = Convert(dict[cc[0]], cc[1])
+    if slots:
+        return Package.from_dict(dict)
     return dict
 
 
@@ -559,11 +1106,21 @@ _pol_pak_convert_keys = [
     ['feu', 'BOOL'],
 ]
 
+Policy = _record_class('Policy', _pol_keys, _pol_convert_keys,
+                       ['paks', 'scripts', 'groups', 'excluded_groups'])
+PolicyPackage = _record_class('PolicyPackage', _pol_pak_keys,
+                              _pol_pak_convert_keys)
+PolicyScript = _record_class('PolicyScript', _pol_script_keys)
 
-def policy(policy):
+
+def policy(policy, slots=False):
     """Returns a dictionary of info about a policy. The key 'paks' is an
     array of dictionaries with info on the packages included in the policy
-    and the key 'scripts' does the same for scripts.
+    and the key 'scripts' does the same for scripts. 'groups' is an array of
+    dictionaries with the id and name of each computer group the policy is
+    scoped to and 'excluded_groups' the same for the groups excluded from
+    its scope. Pass slots=True for a Policy holding arrays of PolicyPackage
+    and PolicyScript instead.
     """
     dict = {}
     for key in _pol_keys:
@@ -581,6 +1138,8 @@ def policy(policy):
                 this_pak.update({pak_key: pak.findtext(pak_key)})
             for cc in _pol_pak_convert_keys:
                 this_pak[cc[0]] = Convert(this_pak[cc[0]], cc[1])
+            if slots:
+                this_pak = PolicyPackage.from_dict(this_pak)
             paks.append(this_pak)
     dict.update({'paks': paks})
 
@@ -592,9 +1151,20 @@ def policy(policy):
             this_script = {}
             for s_key in _pol_script_keys:
                 this_script.update({s_key: script.findtext(s_key)})
+            if slots:
+                this_script = PolicyScript.from_dict(this_script)
             scripts.append(this_script)
     dict.update({'scripts': scripts})
 
+    for key, path in [['groups', 'scope/computer_groups/computer_group'],
+                      ['excluded_groups',
+                       'scope/exclusions/computer_groups/computer_group']]:
+        dict[key] = [{'id': group.findtext('id'),
+                      'name': group.findtext('name')}
+                     for group in policy.findall(path)]
+
+    if slots:
+        return Policy.from_dict(dict)
     return dict
 
 
@@ -792,6 +1362,8 @@ _m_info_keys = [
     ['location/room', 'room'],
 ]
 
+_m_info_plan = _compile_keys(_m_info_keys)
+
 _m_info_convert_keys = [
     ['last_inventory', 'DATE'],
     ['last_inventory_epoch', 'EPOK'],
@@ -813,29 +1385,44 @@ _m_info_convert_keys = [
     ['last_backup_time_epoch', 'EPOK'],
 ]
 
+MInfo = _record_class('MInfo', _m_info_keys, _m_info_convert_keys)
+
+_m_info_lazy = _lazy_keys(_m_info_keys, _m_info_convert_keys)
 
-def m_info(device):
+
+def m_info(device, slots=False, lazy=False):
     """Returns a a dictionary of general information about an iOS device.
+    Pass slots=True for a MInfo instead, or lazy=True for a LazyInfo that
+    only converts the keys you read.
     """
-    dict = {}
-    for key in _m_info_keys:
-        dict.update({key[1]: device.findtext(key[0])})
+    if lazy:
+        return LazyInfo(device, *_m_info_lazy)
+    dict = _extract(device, _m_info_plan)
     for dd in _m_info_convert_keys:
         dict[dd[0]] = Convert(dict[dd[0]], dd[1])
+    if slots:
+        return MInfo.from_dict(dict)
     return dict
 
 
-def m_info_write(info, device):
+def m_info_write(info, device, minimal=False):
     """Writes out any changed device info. Pass it the info
     dictionary with changed info and the object returned from
     jss.mobiledevice()
+    Pass minimal=True to send the JSS only the fields that differ from what
+    m_info reads from device, and nothing at all if none do. Returns True
+    if anything was sent.
     """
     our_info = copy.deepcopy(info)
     for key in _m_info_convert_keys:
         our_info[key[0]] = Convert_back(info[key[0]], key[1])
+    if minimal:
+        return _put(device, _changed(
+            info, m_info(device), _m_info_keys, our_info))
     for key in _m_info_keys:
         device.find(key[0]).text = our_info[key[1]]
-    device.save()
+    _save(device)
+    return True
 
 
 _m_attr_types = {
@@ -864,18 +1451,24 @@ def m_attributes(device):
     return dict
 
 
-def m_attributes_write(attribs, device):
+def m_attributes_write(attribs, device, minimal=False):
     """Writes out any changed extension attributes. Pass it the attribute
     dictionary with changed attributes and object returned from
     jss.mobiledevice()
+    Pass minimal=True to send the JSS only the attributes that differ from
+    what m_attributes reads from device, and nothing at all if none do.
+    Returns True if anything was sent.
     """
+    if minimal:
+        return _put_attributes(device, attribs, m_attributes(device))
     for attr in device.findall('extension_attributes/extension_attribute'):
         nm = attr.findtext('name')
         val = attr.findtext('value')
         if attribs[nm]['value'] != val:
             new_val = Convert_back(attribs[nm]['value'], attribs[nm]['type'])
             attr.find('value').text = new_val
-    device.save()
+    _save(device)
+    return True
 
 
 _m_security_keys = [
@@ -905,6 +1498,8 @@ _m_security_keys = [
     ['security/lost_location_vertical_accuracy', 'lost_location_vertical_accuracy'],
 ]
 
+_m_security_plan = _compile_keys(_m_security_keys)
+
 _m_security_convert_keys = [
     ['data_protection',  'BOOL'],
     ['block_encrypt_capable',  'BOOL'],
@@ -928,15 +1523,19 @@ _m_security_convert_keys = [
     ['lost_location_vertical_accuracy',  'INTN'],
 ]
 
+MSecurity = _record_class('MSecurity', _m_security_keys,
+                          _m_security_convert_keys)
 
-def m_security(device):
+
+def m_security(device, slots=False):
     """Returns a a dictionary of security information about an iOS device.
+    Pass slots=True for a MSecurity instead.
     """
-    dict = {}
-    for key in _m_security_keys:
-        dict.update({key[1]: device.findtext(key[0])})
+    dict = _extract(device, _m_security_plan)
     for dd in _m_security_convert_keys:
         dict[dd[0]] = Convert(dict[dd[0]], dd[1])
+    if slots:
+        return MSecurity.from_dict(dict)
     return dict
 
 
@@ -958,20 +1557,41 @@ _m_network_keys = [
     ['network/phone_number', 'phone_number'],
 ]
 
+_m_network_plan = _compile_keys(_m_network_keys)
+
 _m_network_convert_keys = [
     ['voice_roaming_enabled', 'BOOL'],
     ['data_roaming_enabled', 'BOOL'],
     ['roaming', 'BOOL'],
 ]
 
+MNetwork = _record_class('MNetwork', _m_network_keys, _m_network_convert_keys)
+
 
-def m_network(device):
+def m_network(device, slots=False):
     """Returns a a dictionary of network information about an iOS device.
+    Pass slots=True for a MNetwork instead.
     """
-    dict = {}
-    for key in _m_network_keys:
-        dict.update({key[1]: device.findtext(key[0])})
+    dict = _extract(device, _m_network_plan)
     for dd in _m_network_convert_keys:
         dict[dd[0]] = Convert(dict[dd[0]], dd[1])
+    if slots:
+        return MNetwork.from_dict(dict)
     return dict
 
+
+# the sections of a mobile device record each routine reads
+_m_sections = {
+    m_info: _sections(_m_info_keys),
+    m_attributes: ['extension_attributes'],
+    m_security: _sections(_m_security_keys),
+    m_network: _sections(_m_network_keys),
+}
+
+
+def m_subset(extractors):
+    """Returns the subset of the mobile device record the functions in
+    extractors need, ready to hand to jss.MobileDevice(id, subset=...).
+    Returns None if one of them isn't a routine from here.
+    """
+    return _subset(_m_sections, extractors)
@@ -0,0 +1,456 @@
+#
+# mock_jss.py
+#
+# A stand-in JSS that serves records out of a directory of
+# (sanitised) XML so we can try things without a real one.
+#
+"""A local stand-in for the JSS API.
+
+It serves the records found in a directory laid out as
+<dir>/<kind>/<id>.xml, for example computers/64.xml or policies/12.xml,
+where kind is the name the JSS uses in its URLs. Listings such as
+/JSSResource/computers are built from the records. You can also hand it
+a dictionary of {kind: {id: xml}} instead of a directory. Each record is
+read once when it starts for what it puts in the listings, and again when
+it is PUT, so asking for a listing doesn't go through the whole fleet.
+
+    server = MockJSS('fixtures')
+    server.start()
+    j = jss.JSS(url=server.url, user='mock', password='mock')
+    ...
+    server.stop()
+
+or from the command line `python mock_jss.py fixtures 8080`
+
+To see how code copes with a JSS under load it can be made slow, flaky
+and short of connections. latency is how long each request waits before
+it is answered, a number of seconds or one of uniform(), normal(),
+lognormal() or exponential() for a spread like a real server's. error_rate
+of the requests fail with one of error_codes. No more than
+max_connections requests are served at once, the rest wait their turn
+the way they do when the JSS runs out of threads. Pass a seed to get the
+same latencies and failures every run.
+
+    server = MockJSS('fixtures', latency=lognormal(0.2, 0.5),
+                     error_rate=0.01, max_connections=20, seed=1)
+"""
+
+import contextlib
+import math
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import zipfile
+from xml.etree import ElementTree
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import unquote
+
+from jss_tools import _merge
+
+# the element name for a record in each listing
+_list_tags = {
+    'computers': 'computer',
+    'mobiledevices': 'mobile_device',
+    'policies': 'policy',
+    'computergroups': 'computer_group',
+    'mobiledevicegroups': 'mobile_device_group',
+    'packages': 'package',
+    'scripts': 'script',
+    'categories': 'category',
+}
+
+# what goes in a listing besides the id and name
+_list_keys = {
+    'mobiledevices': [
+        'device_name',
+        'udid',
+        'serial_number',
+        'phone_number',
+        'wifi_mac_address',
+        'managed',
+        'supervised',
+        'model',
+        'model_identifier',
+        'model_display',
+        'username',
+    ],
+}
+
+# what goes in /computers/subset/basic and where it comes from
+_basic_keys = [
+    ['managed', 'general/remote_management/managed'],
+    ['username', 'location/username'],
+    ['model', 'hardware/model'],
+    ['department', 'location/department'],
+    ['building', 'location/building'],
+    ['mac_address', 'general/mac_address'],
+    ['udid', 'general/udid'],
+    ['serial_number', 'general/serial_number'],
+    ['report_date_utc', 'general/report_date_utc'],
+    ['report_date_epoch', 'general/report_date_epoch'],
+]
+
+
+def uniform(low, high):
+    """Latency spread evenly between low and high seconds."""
+    return lambda rand: rand.uniform(low, high)
+
+
+def normal(mean, sd):
+    """Latency with a normal spread around mean seconds, never below 0."""
+    return lambda rand: max(0, rand.normalvariate(mean, sd))
+
+
+def lognormal(median, sigma):
+    """Latency mostly around median seconds with a long slow tail, much
+    like a real JSS. The bigger sigma the longer the tail.
+    """
+    mu = math.log(median)
+    return lambda rand: rand.lognormvariate(mu, sigma)
+
+
+def exponential(mean):
+    """Latency averaging mean seconds, most short and a few long."""
+    return lambda rand: rand.expovariate(1.0 / mean)
+
+
+def load(path):
+    """Returns a dictionary of {kind: {id: xml}} read from a directory laid
+    out as <path>/<kind>/<id>.xml, or a zip file laid out the same way like
+    the ones jss_fixtures writes.
+    """
+    records = {}
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                parts = name.split('/')
+                if (len(parts) == 2 and parts[0] != 'listings'
+                        and parts[1].endswith('.xml')):
+                    records.setdefault(parts[0], {})[parts[1][:-4]] = (
+                        archive.read(name))
+        return records
+    for kind in os.listdir(path):
+        if not os.path.isdir(os.path.join(path, kind)):
+            continue
+        records[kind] = {}
+        for name in os.listdir(os.path.join(path, kind)):
+            if name.endswith('.xml'):
+                with open(os.path.join(path, kind, name), 'rb') as ff:
+                    records[kind][name[:-4]] = ff.read()
+    return records
+
+
+def _find(record, key):
+    """findtext at the top of a record or in its general section"""
+    val = record.findtext('general/' + key)
+    if val is None:
+        val = record.findtext(key)
+    return val
+
+
+def _subset(body, subset):
+    """Cuts a record down to the sections in a subset like
+    'General&Hardware', the way the JSS does.
+    """
+    wanted = [name.lower() for name in unquote(subset).split('&')]
+    record = ElementTree.fromstring(body)
+    for section in list(record):
+        if section.tag.replace('_', '') not in wanted:
+            record.remove(section)
+    return ElementTree.tostring(record)
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # the headers and body go out in two writes, on a connection that is
+    # kept open the body would wait for the client to acknowledge them
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code, body=b''):
+        self.send_response(code)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _parts(self):
+        path = self.path.split('?')[0]
+        if not path.startswith('/JSSResource/'):
+            return None
+        return path[len('/JSSResource/'):].strip('/').split('/')
+
+    def _fail(self):
+        """Waits out the latency and returns True if this request should
+        fail the way an overloaded JSS does.
+        """
+        server = self.server.mock
+        delay, code = server.draw()
+        if delay:
+            time.sleep(delay)
+        if code:
+            self._send(code)
+            return True
+        return False
+
+    def do_GET(self):
+        with self.server.mock.slot():
+            self._get()
+
+    def do_PUT(self):
+        with self.server.mock.slot():
+            self._put()
+
+    def _get(self):
+        parts = self._parts()
+        server = self.server.mock
+        if self._fail():
+            return
+        if not parts or parts[0] not in server.records:
+            self._send(404)
+        elif len(parts) == 1:
+            self._send(200, server.listing(parts[0]))
+        elif (parts[0] == 'computers' and len(parts) == 3
+              and parts[1] == 'subset' and parts[2].lower() == 'basic'):
+            self._send(200, server.listing(parts[0], basic=True))
+        elif len(parts) >= 3 and parts[1] == 'id':
+            body = server.records[parts[0]].get(parts[2])
+            if body is None:
+                self._send(404)
+            elif len(parts) == 5 and parts[3] == 'subset':
+                self._send(200, _subset(body, parts[4]))
+            else:
+                self._send(200, body)
+        else:
+            self._send(404)
+
+    def _put(self):
+        parts = self._parts()
+        server = self.server.mock
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self._fail():
+            return
+        if (not parts or len(parts) < 3 or parts[1] != 'id'
+                or parts[2] not in server.records.get(parts[0], {})):
+            self._send(404)
+        else:
+            server.put(parts[0], parts[2], body)
+            self._send(201, ('<%s><id>%s</id></%s>' % (
+                _list_tags.get(parts[0], parts[0]), parts[2],
+                _list_tags.get(parts[0], parts[0]))).encode('utf-8'))
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, *args):
+        HTTPServer.__init__(self, *args)
+        # the connections still open, a client can keep one open for as
+        # long as it likes and the thread serving it waits on it
+        self.open = set()
+        self.open_lock = threading.Lock()
+        self.threads = set()
+
+    def process_request(self, request, client_address):
+        # ThreadingMixIn's, keeping hold of the thread so stop() can wait
+        # for it
+        thread = threading.Thread(target=self.process_request_thread,
+                                  args=(request, client_address))
+        thread.daemon = True
+        with self.open_lock:
+            self.threads = set(tt for tt in self.threads if tt.is_alive())
+            self.threads.add(thread)
+        thread.start()
+
+    def get_request(self):
+        conn, address = HTTPServer.get_request(self)
+        with self.open_lock:
+            self.open.add(conn)
+        return conn, address
+
+    def shutdown_request(self, request):
+        with self.open_lock:
+            self.open.discard(request)
+        HTTPServer.shutdown_request(self, request)
+
+
+class MockJSS(object):
+    """A stand-in JSS serving records from a directory or a dictionary of
+    {kind: {id: xml}}. Pass port=0 (the default) to get a free port, the
+    URL to hand to jss.JSS() is in .url once it is started. Every request
+    waits `latency` seconds before it is answered, like a JSS far away,
+    either a number or one of uniform(), normal(), lognormal() or
+    exponential(). `error_rate` of them (0.1 is one in ten) fail with one
+    of `error_codes`. No more than `max_connections` (if given) are served
+    at once, the rest wait. `seed` makes the latencies and failures the
+    same every run.
+
+    requests, errors and puts count what has been asked of it, peak the
+    most requests it was ever serving at once.
+    """
+
+    def __init__(self, records, port=0, latency=0, error_rate=0,
+                 error_codes=(503,), max_connections=None, seed=None):
+        if not isinstance(records, dict):
+            records = load(records)
+        self.records = records
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_codes = list(error_codes)
+        self.max_connections = max_connections
+        self.requests = 0
+        self.errors = 0
+        self.puts = 0
+        self.peak = 0
+        self.url = None
+        self._active = 0
+        self._rand = random.Random(seed)
+        self._lock = threading.Lock()
+        self._slots = None
+        self._server = None
+        self._thread = None
+        # each record's part of the listings, parsed once here rather than
+        # on every request for one, and the listings as they were last sent
+        self._items = dict(
+            (kind, dict((id, self._item(kind, id, body))
+                        for id, body in bodies.items()))
+            for kind, bodies in records.items())
+        self._listings = {}
+
+    def draw(self):
+        """Returns how long the next request waits and the error code it
+        fails with, or None if it doesn't.
+        """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency
+            if callable(delay):
+                delay = delay(self._rand)
+            code = None
+            if self.error_rate and self._rand.random() < self.error_rate:
+                code = self._rand.choice(self.error_codes)
+                self.errors += 1
+        return delay, code
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Holds one of the max_connections while a request is served."""
+        if self._slots is not None:
+            self._slots.acquire()
+        with self._lock:
+            self._active += 1
+            self.peak = max(self.peak, self._active)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+            if self._slots is not None:
+                self._slots.release()
+
+    def stats(self):
+        """Returns a dictionary of the 'requests', 'errors', 'puts' and
+        'peak' so far.
+        """
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors,
+                    'puts': self.puts, 'peak': self.peak}
+
+    def _item(self, kind, id, body):
+        """Returns what a record puts in its listing and in the basic one."""
+        record = ElementTree.fromstring(body)
+        item = ElementTree.Element(_list_tags.get(kind, kind[:-1]))
+        ElementTree.SubElement(item, 'id').text = id
+        ElementTree.SubElement(item, 'name').text = _find(record, 'name')
+        for key in _list_keys.get(kind, []):
+            ElementTree.SubElement(item, key).text = _find(record, key)
+        plain = ElementTree.tostring(item)
+        for key, path in _basic_keys:
+            ElementTree.SubElement(item, key).text = record.findtext(path)
+        return plain, ElementTree.tostring(item)
+
+    def listing(self, kind, basic=False):
+        """Returns the XML the JSS gives for a listing of kind, or for
+        /computers/subset/basic if basic is True.
+        """
+        with self._lock:
+            body = self._listings.get((kind, basic))
+            if body is None:
+                items = self._items[kind]
+                body = b''.join(
+                    [('<%s><size>%d</size>' % (kind, len(items))).encode()]
+                    + [items[id][basic] for id in sorted(items, key=int)]
+                    + [('</%s>' % kind).encode()])
+                self._listings[(kind, basic)] = body
+            return body
+
+    def put(self, kind, id, body):
+        """Applies a PUT of body to a record. puts counts them."""
+        with self._lock:
+            record = ElementTree.fromstring(self.records[kind][id])
+            _merge(record, ElementTree.fromstring(body))
+            self.records[kind][id] = ElementTree.tostring(record)
+            self._items[kind][id] = self._item(kind, id,
+                                               self.records[kind][id])
+            self._listings.pop((kind, False), None)
+            self._listings.pop((kind, True), None)
+            self.puts += 1
+
+    def start(self):
+        """Starts serving on a background thread."""
+        if self.max_connections:
+            self._slots = threading.Semaphore(self.max_connections)
+        self._server = _Server(('127.0.0.1', self.port), _Handler)
+        self._server.mock = self
+        self.port = self._server.server_address[1]
+        self.url = 'http://127.0.0.1:%d' % self.port
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops serving and closes the connections clients kept open."""
+        self._server.shutdown()
+        self._server.server_close()
+        with self._server.open_lock:
+            for conn in self._server.open:
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)
+                except socket.error:
+                    pass
+            threads = list(self._server.threads)
+        # give them a moment to finish, one still sleeping out its latency
+        # is left to die with us
+        deadline = time.time() + 2
+        for thread in threads:
+            thread.join(max(0, deadline - time.time()))
+
+
+if __name__ == '__main__':
+    # mock_jss.py dir [port] [latency] [error_rate] [max_connections]
+    args = sys.argv[2:] + [None] * 4
+    server = MockJSS(sys.argv[1], int(args[0] or 0), float(args[1] or 0),
+                     float(args[2] or 0), max_connections=int(args[3] or 0))
+    server.start()
+    print('Serving %s at %s' % (sys.argv[1], server.url))
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+        print(server.stats())
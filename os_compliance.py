@@ -0,0 +1,143 @@
+#
+# os_compliance.py
+#
+# check a whole fleet against the OS versions and builds we allow.
+#
+"""OS compliance for a whole fleet at once.
+
+The rules are a table keyed on release ('10.12', '10.13', '11') giving
+the oldest version and build allowed on that release. A Mac on a release
+older than any in the table, or on a release we skipped, needs an
+'os_upgrade'. One on a release in the table but below its version needs
+an 'os_upgrade' too, below its build it needs an 'os_update'. Releases
+newer than any in the table are fine.
+
+Builds are compared as builds, so this is stricter than the check
+compliance.py used to do, which compared them as hex numbers and only
+looked at the build above 10.13.0. A 10.13.0 build such as 17A365 or a
+10.13.1 supplemental build such as 17B1003 is older than 17C88 and now
+needs an 'os_update' where it used to pass.
+
+A fleet only runs a few dozen versions and builds between them so each
+distinct pair is parsed and checked once and every Mac gets the answer
+for its pair.
+
+    infos = (result['c_info'] for result in iter_computers(j))
+    for info, reason in report(infos):
+        print info['machine_name'], reason
+"""
+
+import re
+
+# release: [oldest version, oldest build]
+rules = {
+    '10.12': ['10.12.6', '16F73'],
+    '10.13': ['10.13.0', '17C88'],
+}
+
+# what we say about a Mac whose os or os_build we can't make sense of
+UNKNOWN = 'os_unknown'
+
+_version_re = re.compile(r'^\d+(\.\d+)*$')
+# e.g. 17G65, 16G1036 or 18A391a
+_build_re = re.compile(r'^(\d+)([A-Z])(\d+)([a-z]?)$')
+
+
+def parse_version(val):
+    """Turns '10.13.6' into (10, 13, 6) so versions compare properly, or
+    None if it isn't a version. '10.13' and '10.13.0' are the same.
+    """
+    if val is None or not _version_re.match(str(val)):
+        return None
+    ar = [int(part) for part in str(val).split('.')]
+    while len(ar) > 1 and ar[-1] == 0:
+        ar.pop()
+    return tuple(ar)
+
+
+def parse_build(val):
+    """Turns a build like '17G65' into (17, 'G', 65, '') so builds compare
+    properly, or None if it isn't a build.
+    """
+    found = _build_re.match(val or '')
+    if found is None:
+        return None
+    return (int(found.group(1)), found.group(2), int(found.group(3)),
+            found.group(4))
+
+
+def _release(version):
+    """The release a version belongs to, 10.x.y is 10.x and 11.x is 11."""
+    if version[0] == 10:
+        return version[:2]
+    return version[:1]
+
+
+def _compile(rules):
+    """Parses a rule table once into {release: [version, build]} and the
+    newest release in it.
+    """
+    plan = {}
+    for release, [version, build] in rules.items():
+        plan[parse_version(release)] = [parse_version(version),
+                                        parse_build(build)]
+    return plan, max(plan)
+
+
+def _verdict(os, os_build, plan, newest):
+    """The reason a Mac running os and os_build isn't compliant, or None
+    if it is.
+    """
+    version = parse_version(os)
+    if version is None:
+        return UNKNOWN
+    release = _release(version)
+    if release not in plan:
+        if release > newest:
+            return None
+        return 'os_upgrade'
+    min_version, min_build = plan[release]
+    if version < min_version:
+        return 'os_upgrade'
+    build = parse_build(os_build)
+    if build is None:
+        return UNKNOWN
+    if build < min_build:
+        return 'os_update'
+    return None
+
+
+def _checker(rules):
+    """Returns a function giving the reason one c_info isn't compliant,
+    remembering the answer for each os and os_build it has seen.
+    """
+    plan, newest = _compile(rules)
+    seen = {}
+
+    def verdict(info):
+        pair = (info['os'], info['os_build'])
+        if pair not in seen:
+            seen[pair] = _verdict(pair[0], pair[1], plan, newest)
+        return seen[pair]
+    return verdict
+
+
+def check(infos, rules=rules):
+    """Returns the reason each of infos (c_info dictionaries) isn't
+    compliant, 'os_upgrade', 'os_update' or 'os_unknown', or None if it
+    is. The array is in the same order as infos.
+    """
+    verdict = _checker(rules)
+    return [verdict(info) for info in infos]
+
+
+def report(infos, rules=rules):
+    """Yields [info, reason] for every one of infos that isn't compliant
+    as it comes to it, so given a generator the first is out before the
+    last Mac has been fetched.
+    """
+    verdict = _checker(rules)
+    for info in infos:
+        reason = verdict(info)
+        if reason is not None:
+            yield [info, reason]
@@ -32,7 +32,9 @@ for entry in jss.Computer():
     info['serial'] = new_serial
     info['user'] = first + surname[0]
     info['managed'] = True
-    tools.c_remote(computer, 'jamf015', 'jamf1234')
-    tools.c_info_write(info, computer)
+    # one save for both rather than one each
+    with tools.EditSession():
+        tools.c_remote(computer, 'jamf015', 'jamf1234')
+        tools.c_info_write(info, computer)
     print info['id'], " ", info['name']
 
@@ -266,6 +266,16 @@ if (strg is tstrg) & (ebol is tebol) & (enbl is tenbl):
 else:
     print "Convert: Failed 3/3"
 
+# the fast JSS date parse has to agree with dateutil
+from dateutil import parser
+
+if ((tools.Convert(date, 'DATE') == parser.parse(date))
+        & (tools.Convert(dutc, 'DUTC') == parser.parse(dutc))
+        & (tools.Convert(tme, 'TIME') == parser.parse(tme))):
+    print "Convert dates: Passed"
+else:
+    print "Convert dates: Failed"
+
 ### iOS side
 
 devices = jss.MobileDevice()
@@ -0,0 +1,88 @@
+#
+# test_async.py
+#
+# jss_async against the mock JSS, it needs python 3.7 so it is kept
+# apart from test_mock.
+#
+"""Tests of jss_async against mock_jss.
+
+    python3 -m unittest test_async
+"""
+
+import asyncio
+import unittest
+from xml.etree import ElementTree
+
+import jss_async
+import jss_stats
+import mock_jss
+from test_mock import _records, _small
+
+
+class AsyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = mock_jss.MockJSS(_records(**_small),
+                                       latency=0.05).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_timed_from_slot(self):
+        stats = jss_stats.enable()
+        stats.reset()
+        try:
+            j = jss_async.AsyncJSS(self.server.url, 'mock', 'mock', limit=2)
+            asyncio.run(j.fetch_all('computers', ids=range(1, 9)))
+        finally:
+            jss_stats.disable()
+        timing = stats.get('GET computers')
+        self.assertEqual(timing['calls'], 8)
+        # eight requests two at a time, the last waited for three rounds
+        self.assertLess(timing['max'], 0.15)
+
+    def test_connections_kept(self):
+        j = jss_async.AsyncJSS(self.server.url, 'mock', 'mock', limit=4)
+        opened = []
+        original = asyncio.open_connection
+
+        def counted(*args, **kwargs):
+            opened.append(args)
+            return original(*args, **kwargs)
+
+        async def sweeps():
+            first = await j.fetch_all('computers', ids=range(1, 21))
+            # as if the JSS had dropped them while they sat idle
+            for reader, writer in j._idle:
+                writer.transport.abort()
+            second = await j.fetch_all('computers', ids=range(1, 21))
+            await j.close()
+            return first, second
+
+        asyncio.open_connection = counted
+        try:
+            first, second = asyncio.run(sweeps())
+        finally:
+            asyncio.open_connection = original
+        self.assertEqual([record.findtext('general/id') for record in second],
+                         [str(id) for id in range(1, 21)])
+        self.assertEqual(ElementTree.tostring(first[6]),
+                         ElementTree.tostring(second[6]))
+        self.assertLessEqual(len(opened), 8)
+
+    def test_second_loop(self):
+        j = jss_async.AsyncJSS(self.server.url, 'mock', 'mock', limit=2)
+
+        async def sweep():
+            # more than limit at once so some wait on the semaphore
+            records = await j.fetch_all('computers', ids=range(1, 9))
+            await j.close()
+            return records
+
+        # each asyncio.run is a new loop, nothing made in the last is used
+        for _ in range(2):
+            self.assertEqual(len(asyncio.run(sweep())), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,819 @@
+#
+# test_mock.py
+#
+# tests that run against mock_jss and made up records, no JSS
+# needed. python -m unittest test_mock
+#
+"""Tests for the fleet routines that don't need a real JSS.
+
+test.py needs a JSS to talk to. These use fake_fleet's made up records,
+in a MockJSS when we need to see the requests go over the wire.
+"""
+
+import copy
+import io
+import multiprocessing
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from xml.etree import ElementTree
+
+import fake_fleet
+import jss_tools as tools
+import mock_jss
+from jss_apps import AppIndex, version_key
+from jss_cache import RecordCache, cached_computer
+from jss_fixtures import FixtureJSS, capture
+from jss_fleet import (TokenBucket, _is_transient, _pool, _results,
+                       bulk_write, expand_groups, extract_records,
+                       iter_computers)
+from jss_graph import PolicyGraph
+from jss_groups import GroupIndex
+import jss_snapshot
+import os_compliance
+try:
+    from jss_table import FleetTable
+except ImportError:
+    # it needs numpy
+    FleetTable = None
+
+# a fleet small enough to start for every test
+_small = {'computers': 20, 'mobile_devices': 5, 'policies': 5, 'groups': 3,
+          'packages': 5, 'scripts': 3, 'categories': 2, 'apps': 10,
+          'attributes': 5}
+
+
+def _records(**kwargs):
+    records = {}
+    for kind, id, xml in fake_fleet.fleet(**kwargs):
+        records.setdefault(kind, {})[str(id)] = xml
+    return records
+
+
+class _Counted(object):
+    """Computer() the way python-jss does it from fake_fleet records,
+    counting the fetches.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self.fetches = 0
+
+    def Computer(self, data, subset=None):
+        if ElementTree.iselement(data):
+            return data
+        self.fetches += 1
+        return ElementTree.fromstring(self.records[int(data)])
+
+
+class PoolTest(unittest.TestCase):
+
+    def test_ordered(self):
+        def work(ii):
+            # the later items finish first
+            time.sleep((10 - ii) * 0.002)
+            return ii * ii
+
+        self.assertEqual(list(_pool(work, range(10), workers=4,
+                                    ordered=True)),
+                         [ii * ii for ii in range(10)])
+        self.assertEqual(sorted(_pool(work, range(10), workers=4)),
+                         [ii * ii for ii in range(10)])
+
+    def test_bounded(self):
+        taken = []
+
+        def items():
+            for ii in range(1000):
+                taken.append(ii)
+                yield ii
+
+        results = _pool(lambda ii: ii, items(), workers=4)
+        next(results)
+        time.sleep(0.1)
+        # the one we have and no more than 2 * workers behind it
+        self.assertLessEqual(len(taken), 9)
+        self.assertEqual(len(list(results)), 999)
+
+    def test_error(self):
+        seen = []
+        lock = threading.Lock()
+
+        def work(ii):
+            with lock:
+                seen.append(ii)
+            if ii == 5:
+                raise ValueError(ii)
+            return ii
+
+        with self.assertRaises(ValueError):
+            list(_pool(work, range(1000), workers=2))
+        time.sleep(0.1)
+        # the pool stopped rather than working through the rest
+        self.assertLess(len(seen), 20)
+
+    def test_items_error(self):
+        def items():
+            for ii in range(10):
+                yield ii
+            raise IOError('the listing went away')
+
+        for ordered in [False, True]:
+            with self.assertRaises(IOError):
+                list(_pool(lambda ii: ii, items(), workers=2,
+                           ordered=ordered))
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_rate(self):
+        bucket = TokenBucket(50, burst=5)
+        start = time.time()
+        for _ in range(5):
+            bucket.take()
+        self.assertLess(time.time() - start, 0.05)
+        for _ in range(10):
+            bucket.take()
+        # ten more at 50 a second
+        self.assertGreaterEqual(time.time() - start, 0.18)
+
+
+class ExtractorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.computer = ElementTree.fromstring(fake_fleet.computer(1))
+        self.device = ElementTree.fromstring(fake_fleet.mobile_device(1))
+        self.policy = ElementTree.fromstring(fake_fleet.policy(1))
+
+    def test_slots(self):
+        for extractor, record in [(tools.c_info, self.computer),
+                                  (tools.m_info, self.device),
+                                  (tools.policy, self.policy)]:
+            plain = extractor(record)
+            slotted = extractor(record, slots=True)
+            self.assertEqual(slotted.to_dict(), plain)
+            for key, val in plain.items():
+                if key not in ('paks', 'scripts'):
+                    self.assertEqual(getattr(slotted, key), val)
+                    self.assertEqual(slotted[key], val)
+            self.assertFalse(hasattr(slotted, '__dict__'))
+            for copied in [copy.deepcopy(slotted)] + [
+                    pickle.loads(pickle.dumps(slotted, protocol))
+                    for protocol in range(pickle.HIGHEST_PROTOCOL + 1)]:
+                self.assertIs(type(copied), type(slotted))
+                self.assertEqual(copied, slotted)
+                self.assertEqual(copied.to_dict(), plain)
+        policy = tools.policy(self.policy, slots=True)
+        self.assertEqual(policy.paks[0].name,
+                         tools.policy(self.policy)['paks'][0]['name'])
+        # the packages are still records after a copy, and copies
+        for copied in [copy.deepcopy(policy),
+                       pickle.loads(pickle.dumps(policy, 2))]:
+            self.assertIs(type(copied.paks[0]), tools.PolicyPackage)
+            self.assertIsNot(copied.paks[0], policy.paks[0])
+
+    def test_lazy(self):
+        for extractor, record, key in [
+                (tools.c_info, self.computer, 'last'),
+                (tools.m_info, self.device, 'managed')]:
+            converted = []
+            convert = tools.Convert
+
+            def counted(val, typ):
+                converted.append(typ)
+                return convert(val, typ)
+
+            tools.Convert = counted
+            try:
+                lazy = extractor(record, lazy=True)
+                self.assertEqual(converted, [])
+                plain = extractor(record)
+                del converted[:]
+                self.assertEqual(lazy['id'], plain['id'])
+                self.assertEqual(lazy[key], plain[key])
+                # just the one that needed it, and only the first time
+                self.assertEqual(len(converted), 1)
+                lazy[key]
+                self.assertEqual(len(converted), 1)
+            finally:
+                tools.Convert = convert
+            self.assertEqual(sorted(lazy), sorted(plain))
+            for key in plain:
+                self.assertEqual(lazy[key], plain[key])
+            self.assertEqual(lazy.to_dict(), plain)
+            self.assertRaises(KeyError, lambda: lazy['no such key'])
+            self.assertIsNone(lazy.get('no such key'))
+
+
+class ExtractRecordsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.raws = [fake_fleet.computer(id, apps=10, attributes=5)
+                     for id in range(1, 21)]
+        self.extractors = [tools.c_info, tools.c_apps]
+        self.expected = [_results(ElementTree.fromstring(raw),
+                                  self.extractors) for raw in self.raws]
+
+    def test_ordered(self):
+        got = list(extract_records(self.raws, self.extractors, processes=2,
+                                   chunksize=3, ordered=True))
+        self.assertEqual(got, self.expected)
+
+    @unittest.skipUnless(hasattr(multiprocessing, 'get_context'),
+                         'needs python 3')
+    def test_spawn(self):
+        # the default on macOS, nothing is inherited from this process
+        got = list(extract_records(
+            self.raws, self.extractors, processes=2,
+            context=multiprocessing.get_context('spawn')))
+        self.assertEqual(sorted(got, key=lambda rr: int(rr['id'])),
+                         self.expected)
+
+    @unittest.skipUnless(hasattr(multiprocessing, 'get_context'),
+                         'needs python 3')
+    def test_spawn_timed(self):
+        import jss_stats
+        jss_stats.enable()
+        try:
+            got = list(extract_records(
+                self.raws, [tools.c_info, tools.c_apps], processes=2,
+                ordered=True, context=multiprocessing.get_context('spawn')))
+        finally:
+            jss_stats.disable()
+        self.assertEqual(got, self.expected)
+
+
+class RecordCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'records.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_recency_kept(self):
+        cache = RecordCache(self.path, max_bytes=20)
+        cache.put('computers', 1, 'a', b'x' * 10)
+        cache.put('computers', 2, 'a', b'x' * 10)
+        self.assertEqual(cache.get('computers', 1), b'x' * 10)
+        cache.close()
+        # 2 is now the least recently used, even after opening it again
+        cache = RecordCache(self.path, max_bytes=20)
+        cache.put('computers', 3, 'a', b'x' * 10)
+        self.assertIsNotNone(cache.get('computers', 1))
+        self.assertIsNone(cache.get('computers', 2))
+        cache.close()
+
+    def test_read_doesnt_lock(self):
+        cache = RecordCache(self.path)
+        cache.put('computers', 1, 'a', b'x')
+        cache.get('computers', 1)
+        other = RecordCache(self.path)
+        other._db.execute('PRAGMA busy_timeout = 0')
+        other.put('computers', 2, 'a', b'y')
+        other.close()
+        cache.close()
+
+    def test_stamps(self):
+        record = ElementTree.fromstring(fake_fleet.computer(1))
+        jj = _Counted({1: ElementTree.tostring(record)})
+        cache = RecordCache(self.path)
+        stamp = record.findtext('general/last_contact_time')
+        cached_computer(jj, cache, 1, stamp)
+        cached_computer(jj, cache, 1, stamp)
+        self.assertEqual(jj.fetches, 1)
+        cached_computer(jj, cache, 1, 'later')
+        self.assertEqual(jj.fetches, 2)
+        cache.close()
+
+    def test_no_stamp(self):
+        record = ElementTree.fromstring(fake_fleet.computer(1))
+        general = record.find('general')
+        general.remove(general.find('last_contact_time'))
+        jj = _Counted({1: ElementTree.tostring(record)})
+        cache = RecordCache(self.path)
+        cached_computer(jj, cache, 1)
+        cached_computer(jj, cache, 1)
+        # one for the stamp and one for the record each time
+        self.assertEqual(jj.fetches, 4)
+        cache.close()
+
+
+class GroupIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = GroupIndex()
+        for gid, members in [[1, [1, 2, 3, 200000]], [2, [2, 3, 4]],
+                             [3, []]]:
+            self.index.add({'id': str(gid), 'name': 'Group %d' % gid,
+                            'computers': [{'id': str(id)}
+                                          for id in members]})
+
+    def test_combine(self):
+        self.assertEqual(self.index.union(1, 2),
+                         set(['1', '2', '3', '4', '200000']))
+        self.assertEqual(self.index.intersection('Group 1', 2),
+                         set(['2', '3']))
+        self.assertEqual(self.index.difference(1, 2), set(['1', '200000']))
+        self.assertEqual(set(self.index.difference(2, 1)), set(['4']))
+        self.assertEqual(len(self.index.members(3)), 0)
+        self.assertTrue('200000' in self.index.members(1))
+        self.assertFalse('5' in self.index.members(1))
+        self.assertEqual(self.index.members(1) - self.index.members(2),
+                         self.index.difference(1, 2))
+
+    def test_hash(self):
+        members = self.index.members(1)
+        ids = frozenset(['1', '2', '3', '200000'])
+        self.assertEqual(members, ids)
+        self.assertEqual(hash(members), hash(ids))
+        # they are the same key whichever way round
+        self.assertEqual(len(set([members, ids])), 1)
+        self.assertEqual({ids: 'group 1'}[members], 'group 1')
+        self.assertEqual(hash(self.index.members(3)), hash(frozenset()))
+
+    def test_add_again(self):
+        self.index.add({'id': '1', 'name': 'Group 1',
+                        'computers': [{'id': '3'}, {'id': '5'}]})
+        self.assertEqual(self.index.members(1), set(['3', '5']))
+        self.assertEqual(self.index.groups_of(1), set())
+        self.assertEqual(self.index.groups_of(3), set(['1', '2']))
+        self.assertEqual(self.index.groups_of(5), set(['1']))
+        self.index.remove('Group 2')
+        self.assertEqual(self.index.groups_of(3), set(['1']))
+
+
+class OSComplianceTest(unittest.TestCase):
+
+    def test_check(self):
+        infos = [{'os': os, 'os_build': build} for os, build in [
+            ['10.11.6', '15G22010'], ['10.12.6', '16G29'],
+            ['10.13.0', '17A365'], ['10.13.1', '17B1003'],
+            ['10.13.2', '17C88'], ['10.13.6', '17G65'], ['10.14', '18A391'],
+            ['10.13.4', None], ['bogus', '17G65']]]
+        self.assertEqual(os_compliance.check(infos), [
+            'os_upgrade', None, 'os_update', 'os_update', None, None, None,
+            'os_unknown', 'os_unknown'])
+
+    def test_report(self):
+        def infos():
+            yield {'os': '10.13.0', 'os_build': '17A365'}
+            raise AssertionError('read past the first')
+        # the first answer is out before the next Mac is asked for
+        for info, reason in os_compliance.report(infos()):
+            self.assertEqual(reason, 'os_update')
+            break
+
+
+@unittest.skipIf(FleetTable is None, 'needs numpy')
+class FleetTableTest(unittest.TestCase):
+
+    def test_build(self):
+        records = [{'id': '1', 'model': 'iMac', 'ram': 8},
+                   {'id': '2', 'model': 'MacBook Pro'},
+                   {'id': '3', 'model': 'iMac', 'ram': 'lots', 'new': True}]
+        # from a generator, it only gets to go through them once
+        table = FleetTable(dict(record) for record in records)
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.kind('model'), 'str')
+        self.assertEqual(table.kind('ram'), 'object')
+        self.assertEqual(table.kind('new'), 'bool')
+        self.assertEqual(table.count_by('model'),
+                         {'iMac': 2, 'MacBook Pro': 1})
+        self.assertEqual(table.to_dicts(['id', 'ram', 'new']),
+                         [{'id': '1', 'ram': 8, 'new': None},
+                          {'id': '2', 'ram': None, 'new': None},
+                          {'id': '3', 'ram': 'lots', 'new': True}])
+        self.assertTrue(table.nbytes > 0)
+
+
+class _ServerTest(unittest.TestCase):
+    """Starts a MockJSS of the small fleet with server_args and points
+    self.jss, a python-jss JSS, at it.
+    """
+
+    server_args = {}
+
+    def setUp(self):
+        import jss
+        self.records = _records(**_small)
+        self.server = mock_jss.MockJSS(self.records,
+                                       **self.server_args).start()
+        self.jss = jss.JSS(url=self.server.url, user='mock',
+                           password='mock')
+
+    def tearDown(self):
+        self.server.stop()
+
+
+class MockJSSTest(_ServerTest):
+
+    def test_listing_after_put(self):
+        xml = ('<computer><general><name>renamed</name></general>'
+               '<location><building>Annex</building></location></computer>')
+        self.server.put('computers', '7', xml.encode('utf-8'))
+        listing = self.jss.get('/computers')
+        self.assertEqual(listing.findtext('size'), '20')
+        names = dict((computer.findtext('id'), computer.findtext('name'))
+                     for computer in listing.findall('computer'))
+        self.assertEqual(names['7'], 'renamed')
+        basic = dict((computer.findtext('id'), computer.findtext('building'))
+                     for computer in self.jss.get(
+                         '/computers/subset/basic').findall('computer'))
+        self.assertEqual(basic['7'], 'Annex')
+        self.assertEqual(len(basic), 20)
+
+    def test_errors(self):
+        self.server.error_rate = 1
+        self.server.error_codes = [502]
+        with self.assertRaises(Exception) as caught:
+            self.jss.Computer(1)
+        self.assertEqual(caught.exception.status_code, 502)
+        self.assertEqual(self.server.stats()['errors'], 1)
+
+    def test_max_connections(self):
+        import jss
+        self.server.stop()
+        self.server = mock_jss.MockJSS(self.records, latency=0.05,
+                                       max_connections=2).start()
+        self.jss = jss.JSS(url=self.server.url, user='mock',
+                           password='mock')
+        start = time.time()
+        list(iter_computers(self.jss, [tools.c_info], workers=8))
+        stats = self.server.stats()
+        # the listing and twenty records, two at a time
+        self.assertEqual(stats['requests'], 21)
+        self.assertEqual(stats['peak'], 2)
+        self.assertGreaterEqual(time.time() - start, 0.5)
+
+    def test_seed(self):
+        draws = []
+        for _ in range(2):
+            server = mock_jss.MockJSS({}, latency=mock_jss.lognormal(0.2, 0.5),
+                                      error_rate=0.5, seed=3)
+            draws.append([server.draw() for _ in range(20)])
+        self.assertEqual(draws[0], draws[1])
+        self.assertTrue(any(code for delay, code in draws[0]))
+
+
+class FleetTest(_ServerTest):
+
+    def test_iter_computers(self):
+        results = list(iter_computers(self.jss, [tools.c_apps, tools.c_info],
+                                      workers=4, ordered=True))
+        self.assertEqual([result['id'] for result in results],
+                         [str(id) for id in range(1, 21)])
+        self.assertEqual(results[0]['c_info']['id'], '1')
+
+    def test_expand_groups_cache(self):
+        group = tools.computergroup(self.jss.ComputerGroup(1))
+        members = set(computer['id'] for computer in group['computers'])
+        cache = RecordCache(':memory:')
+        got = set(result['id'] for result in expand_groups(
+            self.jss, group, [tools.c_apps], cache=cache))
+        self.assertEqual(got, members)
+        before = self.server.stats()['requests']
+        got = set(result['id'] for result in expand_groups(
+            self.jss, group, [tools.c_apps], cache=cache))
+        self.assertEqual(got, members)
+        # just the listing the second time round
+        self.assertEqual(self.server.stats()['requests'], before + 1)
+        cache.close()
+
+
+class EditSessionTest(_ServerTest):
+
+    def saved(self, id):
+        return ElementTree.fromstring(self.records['computers'][str(id)])
+
+    def test_merged(self):
+        computer = self.jss.Computer(1)
+        info = tools.c_info(computer)
+        attribs = tools.c_attributes(computer)
+        info['building'] = 'Annex'
+        attribs['EA 1']['value'] = not attribs['EA 1']['value']
+        with tools.EditSession() as edit:
+            tools.c_info_write(info, computer, minimal=True)
+            tools.c_attributes_write(attribs, computer, minimal=True)
+        self.assertEqual((edit.writes, edit.saves), (2, 1))
+        self.assertEqual(self.server.stats()['puts'], 1)
+        saved = self.saved(1)
+        self.assertEqual(saved.findtext('location/building'), 'Annex')
+        self.assertEqual(tools.c_attributes(saved)['EA 1']['value'],
+                         attribs['EA 1']['value'])
+
+    def test_full_save_merged(self):
+        computer = self.jss.Computer(2)
+        info = tools.c_info(computer)
+        info['building'] = 'Annex'
+        with tools.EditSession() as edit:
+            tools.c_remote(computer, 'jamf', 'secret')
+            tools.c_info_write(info, computer, minimal=True)
+        self.assertEqual((edit.writes, edit.saves), (2, 1))
+        self.assertEqual(self.server.stats()['puts'], 1)
+        # the whole record went, with the minimal write's change in it
+        saved = self.saved(2)
+        self.assertEqual(saved.findtext('location/building'), 'Annex')
+        self.assertEqual(
+            saved.findtext('general/remote_management/managed'), 'true')
+        self.assertEqual(saved.findtext(
+            'general/remote_management/management_username'), 'jamf')
+
+    def test_raised(self):
+        computer = self.jss.Computer(3)
+        info = tools.c_info(computer)
+        info['building'] = 'Annex'
+        with self.assertRaises(ValueError):
+            with tools.EditSession() as edit:
+                tools.c_info_write(info, computer, minimal=True)
+                raise ValueError()
+        self.assertEqual((edit.writes, edit.saves), (1, 0))
+        self.assertEqual(self.server.stats()['puts'], 0)
+        self.assertIsNone(getattr(tools._session, 'current', None))
+        # and the next write goes straight to the JSS, from a fresh copy
+        # as the one we had keeps the changes
+        tools.c_info_write(info, self.jss.Computer(3), minimal=True)
+        self.assertEqual(self.server.stats()['puts'], 1)
+
+
+class BulkWriteTest(_ServerTest):
+
+    server_args = {'error_rate': 0.3, 'seed': 2}
+
+    def building(self, id):
+        record = ElementTree.fromstring(self.records['computers'][str(id)])
+        return record.findtext('location/building')
+
+    def test_flaky(self):
+        changes = [(id, {'info': {'building': 'Annex'},
+                         'attributes': {'EA 1': True}})
+                   for id in range(1, 11)]
+        report = bulk_write(self.jss, changes, workers=4, rate=100,
+                            retries=10, backoff=0.001)
+        self.assertEqual(report, dict((id, True) for id in range(1, 11)))
+        stats = self.server.stats()
+        self.assertGreater(stats['errors'], 0)
+        self.assertEqual(stats['puts'], 10)
+        self.assertEqual(self.building(7), 'Annex')
+        # nothing left to change the second time
+        self.server.error_rate = 0
+        report = bulk_write(self.jss, changes, workers=4, rate=100)
+        self.assertEqual(report, dict((id, False) for id in range(1, 11)))
+        self.assertEqual(self.server.stats()['puts'], 10)
+
+    def test_retries_run_out(self):
+        self.server.error_rate = 1
+        report = bulk_write(self.jss, [(1, {'info': {'building': 'Annex'}})],
+                            rate=100, retries=2, backoff=0.001)
+        self.assertEqual(report[1].status_code, 503)
+        self.assertEqual(self.server.stats()['requests'], 3)
+
+    def test_not_transient(self):
+        self.server.error_rate = 1
+        self.server.error_codes = [404]
+        report = bulk_write(self.jss, [(1, {'info': {'building': 'Annex'}})],
+                            rate=100, retries=2, backoff=0.001)
+        self.assertEqual(report[1].status_code, 404)
+        self.assertEqual(self.server.stats()['requests'], 1)
+
+    def test_is_transient(self):
+        self.assertTrue(_is_transient(IOError('connection reset')))
+        self.assertFalse(_is_transient(ValueError()))
+
+
+class AppIndexTest(_ServerTest):
+
+    def test_index(self):
+        index = AppIndex()
+        fleet = {}
+        for result in iter_computers(self.jss, [tools.c_apps]):
+            index.add(result['id'], result['c_apps'])
+            fleet[result['id']] = result['c_apps']
+        self.assertEqual(len(index), 20)
+        app = sorted(index.apps())[0]
+        version = fleet['5'][app]
+        self.assertEqual(index.machines(app, version),
+                         set(id for id, apps in fleet.items()
+                             if apps.get(app) == version))
+        self.assertEqual(index.count(app), 20)
+        self.assertEqual(index.outdated(app, '30.0'),
+                         set(id for id, apps in fleet.items()
+                             if version_key(apps[app]) < (30, 0)))
+        self.assertEqual(index.missing(app), set())
+        # machine 3 loses the app, 4 leaves the JSS
+        apps = dict(fleet['3'])
+        del apps[app]
+        index.add(3, apps)
+        index.remove(4)
+        self.assertEqual(index.missing(app), set(['3']))
+        self.assertEqual(index.count(app), 18)
+        self.assertEqual(index.machine(3), apps)
+        self.assertEqual(index.missing('No Such App'), set(index._machines))
+
+
+class PolicyGraphTest(_ServerTest):
+
+    def test_graph(self):
+        graph = PolicyGraph()
+        for entry in self.jss.Policy():
+            graph.add_policy(tools.policy(self.jss.Policy(entry['id'])))
+        self.assertEqual(len(graph), 5)
+        excluding = [id for id in sorted(self.records['policies'])
+                     if graph.excluded_from(id)]
+        self.assertTrue(excluding)
+        id = excluding[0]
+        record = ElementTree.fromstring(self.records['policies'][id])
+
+        def ids(path):
+            return set(node.text for node in record.findall(path))
+
+        groups = ids('scope/computer_groups/computer_group/id')
+        excluded = ids('scope/exclusions/computer_groups/computer_group/id')
+        paks = ids('package_configuration/packages/package/id')
+        self.assertEqual(graph.groups_of(id), groups)
+        self.assertEqual(graph.excluded_from(id), excluded)
+        self.assertEqual(graph.packages_of(id), paks)
+        for group in groups:
+            self.assertIn(id, graph.policies_for_group(group))
+            self.assertNotIn(id, graph.policies_excluding(group))
+        for group in excluded:
+            self.assertIn(id, graph.policies_excluding(group))
+            self.assertNotIn(id, graph.policies_for_group(group))
+        for pak in paks:
+            self.assertIn(id, graph.policies_with_package(pak))
+        # the edges go when the policy does
+        graph.remove_policy(id)
+        for group in excluded:
+            self.assertNotIn(id, graph.policies_excluding(group))
+        for pak in paks:
+            self.assertNotIn(id, graph.policies_with_package(pak))
+
+
+class SnapshotTest(_ServerTest):
+
+    def setUp(self):
+        _ServerTest.setUp(self)
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'fleet.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        _ServerTest.tearDown(self)
+
+    def test_sync(self):
+        snap = jss_snapshot.Snapshot(self.path)
+        self.assertEqual(jss_snapshot.sync(self.jss, snap)['added'], 20)
+        self.assertEqual(jss_snapshot.sync(self.jss, snap)['unchanged'], 20)
+        fleet = snap.load()
+        self.assertEqual(len(fleet), 20)
+        record = ElementTree.fromstring(self.records['computers']['7'])
+        self.assertEqual(fleet['7']['c_apps'], tools.c_apps(record))
+        self.assertEqual(snap.get(7), fleet['7'])
+        snap.close()
+
+    def test_no_report_date(self):
+        self.server.put('computers', '3', b'<computer><general>'
+                        b'<report_date_utc/></general></computer>')
+        snap = jss_snapshot.Snapshot(self.path)
+        self.assertEqual(jss_snapshot.sync(self.jss, snap)['added'], 20)
+        # there's no telling if it has changed so it is fetched every time
+        report = jss_snapshot.sync(self.jss, snap)
+        self.assertEqual((report['changed'], report['unchanged']), (1, 19))
+        snap.close()
+
+    def test_old_format(self):
+        snap = jss_snapshot.Snapshot(self.path)
+        jss_snapshot.sync(self.jss, snap)
+        snap._db.execute("UPDATE meta SET value = 1 WHERE key = 'format'")
+        snap._db.commit()
+        snap.close()
+        # format 1 stamps were last_contact_time, they can't be trusted
+        snap = jss_snapshot.Snapshot(self.path)
+        self.assertEqual(set(snap.stamps().values()), set([None]))
+        self.assertEqual(jss_snapshot.sync(self.jss, snap)['changed'], 20)
+        snap.close()
+
+    def test_apps_in_data(self):
+        # format 2 kept the apps pickled in with the rest
+        db = sqlite3.connect(self.path)
+        db.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value)')
+        db.execute("INSERT INTO meta VALUES ('format', 2)")
+        db.execute('CREATE TABLE machines ('
+                   'id INTEGER PRIMARY KEY, stamp TEXT, data BLOB)')
+        outputs = {'c_apps': {'Safari': '11.1'}, 'c_groups': ['All']}
+        db.execute('INSERT INTO machines VALUES (?, ?, ?)',
+                   (7, 'stamp', jss_snapshot._pack(outputs)))
+        db.commit()
+        db.close()
+        snap = jss_snapshot.Snapshot(self.path)
+        self.assertEqual(snap.get(7), outputs)
+        snap.put(8, outputs)
+        self.assertEqual(snap.load(), {'7': outputs, '8': outputs})
+        snap.close()
+
+
+class FixtureTest(_ServerTest):
+
+    def setUp(self):
+        _ServerTest.setUp(self)
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'sweep.zip')
+        self.counts = capture(self.jss, self.path, key=b'secret')
+        self.fixture = FixtureJSS(self.path)
+
+    def tearDown(self):
+        self.fixture.close()
+        shutil.rmtree(self.dir)
+        _ServerTest.tearDown(self)
+
+    def test_stream(self):
+        for id in ['1', '2', '3']:
+            raw = self.fixture.raw('computers', id)
+            record = ElementTree.fromstring(raw)
+            apps = tools.c_apps(record)
+            ignore = sorted(apps)[:2]
+            for source in [raw, io.BytesIO(raw)]:
+                got = tools.c_stream(source)
+                self.assertEqual(got['info'], tools.c_info(record))
+                self.assertEqual(got['apps'], apps)
+                self.assertEqual(got['attributes'],
+                                 tools.c_attributes(record))
+                self.assertEqual(got['certificates'],
+                                 tools.c_certificates(record))
+                self.assertTrue(got['certificates'])
+            got = tools.c_stream(raw, ignore=ignore)
+            self.assertEqual(got['apps'], tools.c_apps(record, ignore))
+            self.assertFalse(set(ignore) & set(got['apps']))
+
+    def test_capture(self):
+        self.assertEqual(self.counts['computers'], 20)
+        self.assertEqual(self.counts['computergroups'], 3)
+        self.assertEqual(self.fixture.ids('computers'),
+                         [str(id) for id in range(1, 21)])
+
+    def test_sanitised(self):
+        real = ElementTree.fromstring(self.records['computers']['1'])
+        record = self.fixture.Computer(1)
+        name = record.findtext('general/name')
+        self.assertNotEqual(name, real.findtext('general/name'))
+        self.assertNotEqual(record.findtext('general/serial_number'),
+                            real.findtext('general/serial_number'))
+        # the same made up name in the listings and the record
+        listing = dict((entry['id'], entry['name'])
+                       for entry in self.fixture.Computer())
+        self.assertEqual(listing['1'], name)
+        basic = dict((entry['id'], entry['name'])
+                     for entry in self.fixture.Computer(subset='basic'))
+        self.assertEqual(basic['1'], name)
+
+    def test_key(self):
+        other = os.path.join(self.dir, 'other.zip')
+        capture(self.jss, other, ['computers'], key=b'secret')
+        again = FixtureJSS(other)
+        self.assertEqual(again.raw('computers', 1),
+                         self.fixture.raw('computers', 1))
+        again.close()
+        capture(self.jss, other, ['computers'])
+        again = FixtureJSS(other)
+        self.assertNotEqual(
+            again.Computer(1).findtext('general/serial_number'),
+            self.fixture.Computer(1).findtext('general/serial_number'))
+        again.close()
+
+    def test_element(self):
+        record = self.fixture.Computer(ElementTree.fromstring(
+            self.fixture.raw('computers', 3)))
+        self.assertEqual(record.url, 'computers/id/3')
+
+    def test_iter_computers(self):
+        ids = [result['id'] for result in iter_computers(
+            self.fixture, [tools.c_apps], ordered=True)]
+        self.assertEqual(ids, self.fixture.ids('computers'))
+
+    def test_expand_groups(self):
+        group = tools.computergroup(self.fixture.ComputerGroup(1))
+        members = sorted(computer['id'] for computer in group['computers'])
+        cache = RecordCache(':memory:')
+        for _ in range(2):
+            got = sorted(result['id'] for result in expand_groups(
+                self.fixture, group, [tools.c_info], cache=cache))
+            self.assertEqual(got, members)
+        cache.close()
+
+    def test_write(self):
+        info = tools.c_info(self.fixture.Computer(2))
+        info['building'] = 'Test'
+        tools.c_info_write(info, self.fixture.Computer(2), minimal=True)
+        self.assertEqual(tools.c_info(self.fixture.Computer(2))['building'],
+                         'Test')
+        self.assertEqual(self.fixture.puts, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()